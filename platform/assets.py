@@ -0,0 +1,31 @@
+# Background asset loading.
+# Images and sounds are decoded on a thread pool while the start screen is
+# up. Anything that needs the display (convert()) is finished on the main
+# thread once the game asks for it. Decoded assets stay resident, so a
+# restart never reloads anything.
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame as pg
+
+
+class AssetLoader:
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='assets')
+        self.futures = {}
+
+    def image(self, name, filename):
+        self.futures[name] = self.executor.submit(pg.image.load, filename)
+
+    def sound(self, name, filename):
+        self.futures[name] = self.executor.submit(pg.mixer.Sound, filename)
+
+    def ready(self, *names):
+        """True once the named assets (all of them by default) are decoded."""
+        return all(self.futures[name].done() for name in names or self.futures)
+
+    def get(self, name):
+        # Blocks until decoded, re-raises any load error
+        return self.futures[name].result()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
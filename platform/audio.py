@@ -0,0 +1,73 @@
+# Sound effects.
+# Effects play on a fixed pool of reserved mixer channels. A sound fired
+# again within SOUND_REPEAT_MS of its last start is dropped, and when every
+# channel is busy a new sound takes over the channel of the lowest priority
+# sound playing, or is dropped if none ranks below it.
+import pygame as pg
+
+from settings import *
+
+
+class SoundManager:
+    """Plays named effects with voice limiting; sounds=None plays nothing.
+
+    Channel 0 is left for the music, effects use channels 1 to channels.
+    """
+    def __init__(self, game, sounds=None, channels=None):
+        if channels is None:
+            channels = SOUND_CHANNELS
+        self.game = game
+        self.sounds = sounds or {}
+        self.channels = []
+        if sounds is not None:
+            pg.mixer.set_num_channels(1 + channels)
+            pg.mixer.set_reserved(1 + channels)
+            self.channels = [pg.mixer.Channel(1 + i) for i in range(channels)]
+        # (priority, start time) of what each channel last played
+        self.voices = [(0, 0)] * len(self.channels)
+        self.last_start = {}
+        self.counts = dict.fromkeys(('played', 'repeats', 'stolen', 'dropped', 'saturated'), 0)
+        self.peak = 0
+
+    def play(self, name, loops=0):
+        """Play a sound if the limits allow it, returns its channel or None."""
+        now = self.game.clock.get_ticks()
+        last = self.last_start.get(name)
+        if last is not None and now - last < SOUND_REPEAT_MS:
+            self.counts['repeats'] += 1
+            return None
+        self.last_start[name] = now
+        if not self.channels:
+            return None
+        priority = SOUND_PRIORITY.get(name, 0)
+        index = None
+        busy = 0
+        for i, channel in enumerate(self.channels):
+            if channel.get_busy():
+                busy += 1
+            elif index is None:
+                index = i
+        self.peak = max(self.peak, busy)
+        if index is None:
+            self.counts['saturated'] += 1
+            # Take the channel of the lowest priority, oldest sound
+            index = min(range(len(self.channels)), key=self.voices.__getitem__)
+            if self.voices[index][0] > priority:
+                self.counts['dropped'] += 1
+                return None
+            self.counts['stolen'] += 1
+        channel = self.channels[index]
+        channel.play(self.sounds[name], loops=loops)
+        self.voices[index] = (priority, now)
+        self.counts['played'] += 1
+        return channel
+
+    def stop(self):
+        for channel in self.channels:
+            channel.stop()
+
+    def stats(self):
+        """Trigger counts and how often and how far the pool was saturated."""
+        requests = self.counts['played'] + self.counts['dropped']
+        return dict(self.counts, channels=len(self.channels), peak_busy=self.peak,
+                    saturation=self.counts['saturated'] / requests if requests else 0.0)
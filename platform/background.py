@@ -0,0 +1,75 @@
+# Cloud images and the parallax background.
+# Cloud sizes are pre-scaled once at load time instead of on every spawn.
+# With PARALLAX_BACKGROUND the clouds are not sprites at all: they are
+# composed once into a tile that wraps around, and each frame the visible
+# window of it is copied to the screen with a single blit.
+import random
+
+import pygame as pg
+
+from settings import *
+
+
+def cloud_variants(images):
+    """For each cloud image, its copies at every scale in CLOUD_SCALES."""
+    variants = []
+    for image in images:
+        width, height = image.get_size()
+        scaled = []
+        for scale in CLOUD_SCALES:
+            cloud = pg.transform.scale(image, (width * scale // 100, height * scale // 100))
+            cloud.set_colorkey('black', pg.RLEACCEL)
+            scaled.append(cloud)
+        variants.append(scaled)
+    return variants
+
+
+def cloud_variant(variants, scale):
+    # Nearest pre-scaled size at or below scale (in percent)
+    index = 0
+    for i, step in enumerate(CLOUD_SCALES):
+        if step <= scale:
+            index = i
+    return variants[index]
+
+
+class ParallaxBackground:
+    """Scrolling cloud layer with a constant cost per frame.
+
+    The tile is drawn twice in each direction into one buffer, so any
+    screen-sized window of the wrapping layer is a single blit.
+    """
+    def __init__(self, variants, size, clouds=None, seed=0):
+        if clouds is None:
+            clouds = BACKGROUND_CLOUDS
+        self.size = width, height = size
+        # Its own RNG, building the layer must not change the level
+        rng = random.Random(seed)
+        tile = pg.Surface(size).convert()
+        tile.fill(BG_COLOR)
+        for i in range(clouds):
+            image = rng.choice(variants)[rng.randrange(len(CLOUD_SCALES))]
+            x, y = rng.randrange(width), rng.randrange(height)
+            # Also draw the parts that wrap around the tile's edges
+            for dx in (-width, 0):
+                for dy in (-height, 0):
+                    tile.blit(image, (x + dx, y + dy))
+        self.buffer = pg.Surface((width * 2, height * 2)).convert()
+        for x in (0, width):
+            for y in (0, height):
+                self.buffer.blit(tile, (x, y))
+        self.x = 0.0
+        self.y = 0.0
+
+    def reset(self):
+        self.x = self.y = 0.0
+
+    def update(self):
+        self.x = (self.x - BACKGROUND_DRIFT) % self.size[0]
+
+    def scroll(self, dy):
+        self.y = (self.y - dy / BACKGROUND_PARALLAX) % self.size[1]
+
+    def draw(self, surface):
+        area = pg.Rect(int(self.x), int(self.y), *self.size)
+        return surface.blit(self.buffer, (0, 0), area)
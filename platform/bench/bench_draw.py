@@ -0,0 +1,57 @@
+# Micro-benchmark: drawing many sprites per frame.
+# Compares one blit per sprite with plain colorkeyed frames (the old
+# renderer) against RLE accelerated frames, drawn one by one and in a
+# single Surface.blits batch like RenderQueue.draw.
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pygame as pg
+
+from settings import *
+from sprites import Spritesheet
+
+COUNTS = (100, 300, 600)
+FRAMES = 200
+
+
+def main():
+    pg.init()
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    img_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'img')
+    sheet = Spritesheet(os.path.join(img_dir, SPRITESHEET))
+    sheet.preload(GAME_FRAMES)
+    rle = [sheet.get_frame(name) for name in GAME_FRAMES]
+    plain = []
+    for frame in rle:
+        frame = frame.copy()
+        frame.set_colorkey('black')
+        plain.append(frame)
+
+    for count in COUNTS:
+        random.seed(count)
+        placed = [(random.randrange(len(rle)), (random.randrange(WIDTH), random.randrange(HEIGHT)))
+                  for i in range(count)]
+
+        def one_by_one(frames):
+            blit = screen.blit
+            for i, pos in placed:
+                blit(frames[i], pos)
+
+        def batched(frames):
+            screen.blits([(frames[i], pos) for i, pos in placed], False)
+
+        for name, func, frames in (('blit', one_by_one, plain),
+                                   ('blit + RLE', one_by_one, rle),
+                                   ('blits + RLE', batched, rle)):
+            total = min(timeit.repeat(lambda: func(frames), number=FRAMES, repeat=3))
+            print(f'{count:4} sprites, {name:>11}: {total / FRAMES * 1e3:6.3f} ms/frame')
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
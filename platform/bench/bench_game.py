@@ -0,0 +1,300 @@
+# Benchmark suite: the real game loop under scripted scenarios.
+# Every frame runs Game.step and Game.draw on a HeadlessGame (SDL dummy
+# video and audio drivers), the same way Game.run does, and times both.
+# A second pass of each scenario runs under tracemalloc for peak memory
+# and counts the memory blocks still allocated after it, to catch leaks
+# and caches growing without bound.
+#
+#   python bench/bench_game.py --save                record bench/baseline.json
+#   python bench/bench_game.py --check               exit 1 on a regression
+#   python bench/bench_game.py mobs --set DIRTY_RECTS=True
+#
+# Timings depend on the machine, so a baseline is only meaningful on the
+# machine that recorded it. --check refuses (exit 2) a baseline recorded
+# with other --set overrides.
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tracemalloc
+from time import perf_counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pygame as pg
+
+from settings import *
+from headless import HeadlessGame
+from evaluate import apply_overrides, check_setting
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+FRAMES = 1200
+REPEAT = 3
+SEED = 1
+# Where between two ticks frames are drawn when interpolating
+ALPHA = 0.5
+# Mobs kept alive during the swarm
+SWARM = 40
+# Slower than this and by more than the noise floor is a regression
+THRESHOLD = 0.25
+NOISE_MS = 0.02
+NOISE_KB = 64
+NOISE_BLOCKS = 200
+
+
+def hold_up(game):
+    # Keep the player in the scroll zone rising at jump speed, shielded
+    player = game.player
+    player.pos.y = game.camera + HEIGHT / 4
+    player.vel.y = -PLAYER_JUMP / 2
+    player.is_shield = True
+    player.shield_time = game.clock.get_ticks()
+
+
+def walk(game):
+    # Back and forth across the screen, a second each way
+    key = pg.K_LEFT if game.ticks // FPS % 2 else pg.K_RIGHT
+    game.input.set_keys((key,))
+
+
+class Scenario:
+    """Sets up a game and scripts it before every tick.
+
+    When the game ends it is set up again, outside the timed frames.
+    """
+    name = None
+
+    def setup(self, game, seed):
+        random.seed(seed)
+        game.reset()
+
+    def before(self, game):
+        pass
+
+
+class Idle(Scenario):
+    """Standing on the start platform: the floor cost of a frame."""
+    name = 'idle'
+
+
+class Scrolling(Scenario):
+    """Climbing without a break, the screen scrolls every tick."""
+    name = 'scrolling'
+
+    def before(self, game):
+        hold_up(game)
+        walk(game)
+
+
+class MobSwarm(Scenario):
+    """Many mobs at once around a player standing still."""
+    name = 'mobs'
+
+    def before(self, game):
+        game.player.is_shield = True
+        game.player.shield_time = game.clock.get_ticks()
+        for i in range(SWARM - len(game.mobs)):
+            game.pools['mob'].spawn()
+
+
+class PowerupStorm(Scenario):
+    """A powerup on every platform while climbing through them."""
+    name = 'powerups'
+
+    def before(self, game):
+        hold_up(game)
+        walk(game)
+        for plat in game.platforms:
+            if plat.pow is None:
+                plat.pow = game.pools['pow'].spawn(plat)
+
+
+class DeathFall(Scenario):
+    """The camera falling after the player, clearing the level."""
+    name = 'fall'
+    # Ticks climbed before the fall, so there is a level to clear
+    climb = 120
+
+    def setup(self, game, seed):
+        super().setup(game, seed)
+        for tick in range(self.climb):
+            hold_up(game)
+            game.step()
+            game.platgen.fill()
+        game.player.is_shield = False
+        game.player.pos.y = game.camera + HEIGHT + 1
+        game.player.vel.y = 0
+
+
+SCENARIOS = {scenario.name: scenario for scenario in
+             (Idle(), Scrolling(), MobSwarm(), PowerupStorm(), DeathFall())}
+
+
+def frame(game):
+    """Run one frame like Game.run, returns (update, draw) seconds."""
+    start = perf_counter()
+    if INTERPOLATE:
+        game.save_positions()
+    game.step()
+    game.platgen.fill()
+    middle = perf_counter()
+    game.draw(ALPHA if INTERPOLATE else 1.0)
+    return middle - start, perf_counter() - middle
+
+
+def play(game, scenario, frames, seed, measure):
+    # Run frames scripted frames, calling measure(game) after each
+    scenario.setup(game, seed)
+    runs = 1
+    for i in range(frames):
+        scenario.before(game)
+        measure(game)
+        if not game.playing:
+            scenario.setup(game, seed + runs)
+            runs += 1
+
+
+def timings(game, scenario, frames, seed):
+    update, draw = [], []
+
+    def measure(game):
+        u, d = frame(game)
+        update.append(u * 1000)
+        draw.append(d * 1000)
+    play(game, scenario, frames, seed, measure)
+    return update, draw
+
+
+def memory(game, scenario, frames, seed):
+    """Peak and retained traced memory in KB, and blocks kept per 1000 frames."""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    blocks = sys.getallocatedblocks()
+    play(game, scenario, frames, seed, frame)
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_kb': (peak - base) / 1024, 'growth_kb': (current - base) / 1024,
+            'blocks_per_1k_frames': blocks * 1000 / frames}
+
+
+def summary(times):
+    ordered = sorted(times)
+    return {'median': statistics.median(ordered),
+            'p95': ordered[int(len(ordered) * 0.95)],
+            'max': ordered[-1]}
+
+
+def bench(game, scenario, frames=FRAMES, repeat=REPEAT, seed=SEED):
+    """Measure a scenario; each timing is the best of repeat runs."""
+    runs = [timings(game, scenario, frames, seed) for i in range(repeat)]
+    result = {}
+    for i, part in enumerate(('update_ms', 'draw_ms')):
+        stats = [summary(run[i]) for run in runs]
+        result[part] = {key: min(s[key] for s in stats) for key in stats[0]}
+    result.update(memory(game, scenario, frames, seed))
+    result['frames'] = frames
+    return result
+
+
+def regressions(results, baseline, threshold=THRESHOLD):
+    """Describe every metric that got worse than baseline by threshold."""
+    found = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        checks = [(f'{part} {key}', result[part][key], old[part][key], NOISE_MS)
+                  for part in ('update_ms', 'draw_ms') for key in ('median', 'p95')]
+        checks.append(('peak_kb', result['peak_kb'], old['peak_kb'], NOISE_KB))
+        if 'blocks_per_1k_frames' in old:
+            checks.append(('blocks_per_1k_frames', result['blocks_per_1k_frames'],
+                           old['blocks_per_1k_frames'], NOISE_BLOCKS))
+        for metric, new, was, noise in checks:
+            if new > was * (1 + threshold) and new - was > noise:
+                found.append(f'{name}: {metric} {was:.3f} -> {new:.3f} '
+                             f'(+{(new / was - 1) * 100 if was else float("inf"):.0f}%)')
+    return found
+
+
+def parse_setting(text):
+    name, _, value = text.partition('=')
+    try:
+        check_setting(name)
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError) as error:
+        raise argparse.ArgumentTypeError(f'{name}: {error}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the game loop under scripted scenarios.')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--set', dest='overrides', type=parse_setting, action='append',
+                        default=[], metavar='NAME=VALUE', help='override a setting')
+    parser.add_argument('--save', nargs='?', const=BASELINE, metavar='PATH',
+                        help='write the results as the baseline')
+    parser.add_argument('--check', nargs='?', const=BASELINE, metavar='PATH',
+                        help='compare against a baseline, exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown as a fraction (default %(default)s)')
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}')
+
+    overrides = dict(args.overrides)
+    baseline = None
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        # Compare as stored, JSON has no tuples
+        if baseline['overrides'] != json.loads(json.dumps(overrides)):
+            print(f"{args.check} was recorded with overrides {baseline['overrides']}, "
+                  f"this run has {overrides}; not comparing them", file=sys.stderr)
+            return 2
+    apply_overrides(overrides)
+    game = HeadlessGame()
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        result = results[name] = bench(game, SCENARIOS[name], args.frames, args.repeat, args.seed)
+        update, draw = result['update_ms'], result['draw_ms']
+        print(f"{name:>10}: update {update['median']:6.3f} / {update['p95']:6.3f} ms, "
+              f"draw {draw['median']:6.3f} / {draw['p95']:6.3f} ms (median / p95), "
+              f"peak {result['peak_kb']:7.1f} KB, "
+              f"{result['blocks_per_1k_frames']:6.0f} blocks kept/1k frames")
+    game.profiler.close()
+    game.loader.close()
+
+    if args.save:
+        data = {'python': platform.python_version(), 'pygame': pg.version.ver,
+                'machine': platform.machine(), 'overrides': overrides,
+                'scenarios': results}
+        with open(args.save, 'w') as f:
+            json.dump(data, f, indent=2)
+        print(f'baseline written to {args.save}')
+    if args.check:
+        found = regressions(results, baseline['scenarios'], args.threshold)
+        for line in found:
+            print('REGRESSION', line)
+        if found:
+            return 1
+        print(f'no regressions against {args.check}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# Micro-benchmark: collision mask cost per frame.
+# Compares building a mask with pg.mask.from_surface on every tick (the old
+# behaviour) against looking up the mask precomputed by the spritesheet atlas.
+import os
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pygame as pg
+
+from settings import *
+from sprites import Spritesheet
+
+MOBS = 50
+FRAMES = 600
+
+
+def main():
+    pg.init()
+    pg.display.set_mode((WIDTH, HEIGHT))
+    img_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'img')
+    sheet = Spritesheet(os.path.join(img_dir, SPRITESHEET))
+    sheet.preload(GAME_FRAMES)
+    images = [sheet.get_frame(MOB_UP_FRAME), sheet.get_frame(MOB_DOWN_FRAME)]
+
+    def rebuild():
+        for i in range(MOBS):
+            pg.mask.from_surface(images[i & 1])
+
+    def cached():
+        for i in range(MOBS):
+            sheet.get_mask(images[i & 1])
+
+    for name, func in (('from_surface', rebuild), ('atlas cache', cached)):
+        total = min(timeit.repeat(func, number=FRAMES, repeat=3))
+        print(f'{name:>12}: {total / FRAMES * 1e6:8.1f} us/frame ({MOBS} mobs)')
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# Benchmark: time to first frame and restart latency of the windowed game.
+# Runs Game on the SDL dummy video and audio drivers, with the start
+# screen's key wait and the game loop itself stubbed out.
+import os
+import sys
+from time import perf_counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pygame as pg
+
+import main
+
+RESTARTS = 5
+
+
+def main_():
+    start = perf_counter()
+    first_frame = []
+
+    def presented(*args):
+        if not first_frame:
+            first_frame.append(perf_counter() - start)
+    pg.display.flip = presented
+    pg.display.update = presented
+    main.sleep = lambda seconds: None
+    main.Game.wait_for_key = lambda self: None
+    main.Game.run = lambda self: None
+
+    game = main.Game()
+    game.show_start_screen()
+    print(f'time to first frame: {first_frame[0] * 1000:7.1f} ms')
+
+    start = perf_counter()
+    game.new()
+    print(f'first game start:    {(perf_counter() - start) * 1000:7.1f} ms')
+    times = []
+    for i in range(RESTARTS):
+        start = perf_counter()
+        game.new()
+        times.append(perf_counter() - start)
+    print(f'restart latency:     {min(times) * 1000:7.1f} ms (best of {RESTARTS})')
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,93 @@
+# Scripted players for headless runs.
+# A policy is called as policy(game, input) before every tick and drives
+# the game's ScriptedInput. Policies that keep state between ticks are
+# classes with a reset(seed) method, called at the start of each game.
+import random
+
+import pygame as pg
+
+
+def idle(game, input):
+    """Never touch the keys; the baseline for how long standing still lasts."""
+    pass
+
+
+class Climber:
+    """Jump for the nearest platform above and steer towards it."""
+    def __init__(self):
+        self.target = None
+
+    def reset(self, seed=None):
+        self.target = None
+
+    def __call__(self, game, input):
+        player = game.player
+        keys = set()
+        standing = not player.jumping and player.vel.y == 0
+        # Only pick a new target on the ground, so the jump commits to one
+        if standing or self.target is None or not self.target.alive():
+            above = [plat for plat in game.platforms
+                     if plat.rect.top < player.pos.y - 5]
+            self.target = max(above, key=lambda plat: plat.rect.top, default=None)
+        if self.target is not None:
+            x = self.target.rect.centerx
+            if x > player.pos.x + 8:
+                keys.add(pg.K_RIGHT)
+            elif x < player.pos.x - 8:
+                keys.add(pg.K_LEFT)
+        # Hold UP for the whole rise to get the full jump height
+        if standing or (player.vel.y < 0 and pg.K_UP in input.held):
+            keys.add(pg.K_UP)
+        input.set_keys(keys)
+
+
+class Dodger(Climber):
+    """Climber that also steps away from mobs close to its height."""
+    def __call__(self, game, input):
+        super().__call__(game, input)
+        player = game.player
+        if player.is_shield:
+            return
+        for mob in game.mobs:
+            if abs(mob.rect.centery - player.rect.centery) < 80 and \
+                    abs(mob.rect.centerx - player.rect.centerx) < 120:
+                away = pg.K_LEFT if mob.rect.centerx > player.rect.centerx else pg.K_RIGHT
+                keys = {key for key in input.held if key not in (pg.K_LEFT, pg.K_RIGHT)}
+                keys.add(away)
+                input.set_keys(keys)
+                break
+
+
+class Mash:
+    """Random key mashing with its own RNG, so the level stays seeded."""
+    def __init__(self, hold=(5, 30)):
+        self.hold = hold
+        self.rng = random.Random()
+        self.keys = set()
+        self.left = 0
+
+    def reset(self, seed=None):
+        self.rng.seed(seed)
+        self.keys = set()
+        self.left = 0
+
+    def __call__(self, game, input):
+        if self.left <= 0:
+            self.keys = {key for key in (pg.K_LEFT, pg.K_RIGHT, pg.K_UP)
+                         if self.rng.random() < 0.5}
+            self.left = self.rng.randint(*self.hold)
+        self.left -= 1
+        input.set_keys(self.keys)
+
+
+# Policies by name, so worker processes can build them without pickling
+POLICIES = {
+    'idle': lambda: idle,
+    'climber': Climber,
+    'dodger': Dodger,
+    'mash': Mash,
+}
+
+
+def make_policy(name):
+    return POLICIES[name]()
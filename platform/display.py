@@ -0,0 +1,77 @@
+# Window and framebuffer.
+# The game always draws to a WIDTH x HEIGHT surface in its own logical
+# pixels. The display mode is opened at that size with pg.SCALED, so SDL
+# stretches it to the window or the whole screen on the GPU, keeping the
+# aspect ratio, which also takes care of HiDPI and letterboxing. Only when
+# there is no renderer to do that is the framebuffer scaled into a window
+# of another size on the CPU, once per frame.
+import pygame as pg
+
+try:
+    from pygame._sdl2.video import Window
+except ImportError:
+    Window = None
+
+from settings import *
+
+
+class Display:
+    """The window plus the logical-resolution surface the game draws to.
+
+    window is the window size (WINDOW_SIZE, or the logical size). With
+    scaled=False the mode is opened plain, as headless runs want.
+    """
+    def __init__(self, window=None, fullscreen=None, smooth=None, scaled=True):
+        logical = (WIDTH, HEIGHT)
+        self.fullscreen = FULLSCREEN if fullscreen is None else fullscreen
+        self.smooth = SMOOTH_SCALE if smooth is None else smooth
+        output = tuple(window or WINDOW_SIZE or logical)
+        flags = pg.FULLSCREEN if self.fullscreen else 0
+        if scaled:
+            flags |= pg.SCALED
+        self.window = self.set_mode(logical, flags)
+        self.screen = self.window
+        self.target = None
+        if self.scaled:
+            # SDL stretches it, only a window needs telling its size
+            if not self.fullscreen and output != logical and Window is not None:
+                Window.from_display_module().size = output
+        elif self.fullscreen or output != logical:
+            if self.fullscreen:
+                output = pg.display.get_desktop_sizes()[0]
+            self.window = pg.display.set_mode(output, flags & ~pg.SCALED)
+            self.screen = pg.Surface(logical).convert()
+            # Largest rect with the game's aspect ratio, centered
+            scale = min(output[0] / WIDTH, output[1] / HEIGHT)
+            rect = pg.Rect(0, 0, round(WIDTH * scale), round(HEIGHT * scale))
+            rect.center = self.window.get_rect().center
+            self.target = self.window.subsurface(rect)
+        self.size = output
+
+    def set_mode(self, size, flags):
+        self.scaled = bool(flags & pg.SCALED)
+        try:
+            return pg.display.set_mode(size, flags)
+        except pg.error:
+            # No renderer to scale with, open it unscaled
+            self.scaled = False
+            return pg.display.set_mode(size, flags & ~pg.SCALED)
+
+    def present(self):
+        # Scale straight into the window, nothing is allocated per frame
+        if self.smooth and self.screen.get_bitsize() >= 24:
+            pg.transform.smoothscale(self.screen, self.target.get_size(), self.target)
+        else:
+            pg.transform.scale(self.screen, self.target.get_size(), self.target)
+
+    def flip(self):
+        if self.target is not None:
+            self.present()
+        pg.display.flip()
+
+    def update(self, rects):
+        """Show only rects of the framebuffer, or all of it when scaled."""
+        if self.target is not None:
+            self.flip()
+        else:
+            pg.display.update(rects)
@@ -0,0 +1,123 @@
+# Clocks and input sources that drive the game loop.
+# The windowed game uses the pygame backed ones; the headless simulation
+# swaps in a fixed step clock and a scripted input.
+from time import perf_counter
+
+import pygame as pg
+
+from settings import *
+
+
+class RealClock:
+    """Wall clock backed by pygame, caps the loop at the given fps.
+
+    The time is sampled once per tick, so every read within a tick agrees
+    and a recorded session can be replayed exactly.
+    """
+    def __init__(self):
+        self.clock = pg.time.Clock()
+        self.time = pg.time.get_ticks()
+
+    def tick(self, fps=None, idle=None):
+        """Wait out the frame; idle() is called about every ms meanwhile."""
+        if fps is None:
+            fps = FPS
+        if idle is not None and fps:
+            # Sleep in short slices instead of once, so idle() can take
+            # input off SDL's queue as it arrives
+            end = self.time + 1000 / fps
+            while pg.time.get_ticks() < end:
+                idle()
+                pg.time.wait(1)
+            idle()
+            dt = self.clock.tick()
+        else:
+            dt = self.clock.tick(fps)
+        self.time = pg.time.get_ticks()
+        return dt
+
+    def get_ticks(self):
+        return self.time
+
+
+class FixedClock:
+    """Simulated clock advancing a fixed dt (in ms) per tick, never sleeps."""
+    def __init__(self, dt=None):
+        self.dt = 1000 / FPS if dt is None else dt
+        self.time = 0.0
+
+    def tick(self, fps=None):
+        self.time += self.dt
+        return self.dt
+
+    def get_ticks(self):
+        return int(self.time)
+
+    def reset(self):
+        self.time = 0.0
+
+
+class KeyboardInput:
+    """Events and held keys straight from pygame.
+
+    Events get a time attribute, the perf_counter() they were taken off
+    SDL's queue at. Polling while the frame clock waits stamps them
+    within a millisecond or so of the key actually going down.
+    """
+    def __init__(self):
+        self.events = []
+
+    def poll(self):
+        now = perf_counter()
+        for event in pg.event.get():
+            event.time = now
+            self.events.append(event)
+
+    def get_events(self):
+        self.poll()
+        events, self.events = self.events, []
+        return events
+
+    def get_pressed(self):
+        return pg.key.get_pressed()
+
+
+class HeldKeys(set):
+    # Set of held keys indexable like pg.key.get_pressed()
+    __getitem__ = set.__contains__
+
+
+class ScriptedInput:
+    """Input driven from code, for bots and headless runs."""
+    def __init__(self):
+        self.events = []
+        self.held = HeldKeys()
+
+    def press(self, key):
+        if key not in self.held:
+            self.held.add(key)
+            self.events.append(pg.event.Event(pg.KEYDOWN, key=key))
+
+    def release(self, key):
+        if key in self.held:
+            self.held.discard(key)
+            self.events.append(pg.event.Event(pg.KEYUP, key=key))
+
+    def set_keys(self, keys):
+        # Press/release so that exactly `keys` are held
+        for key in list(self.held):
+            if key not in keys:
+                self.release(key)
+        for key in keys:
+            self.press(key)
+
+    def reset(self):
+        self.events = []
+        self.held.clear()
+
+    def get_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def get_pressed(self):
+        return self.held
@@ -0,0 +1,145 @@
+# Struct-of-arrays store for the sprites that move on their own.
+# Positions, velocities and layers of mobs and clouds live in NumPy arrays,
+# so drift and culling are a few array operations per frame. Rects are
+# only written back for sprites that are (or just were) on screen. NumPy
+# is optional; without it the game moves sprites one by one.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from settings import *
+
+
+class EntityStore:
+    available = np is not None
+
+    def __init__(self, capacity=256):
+        self.n = 0
+        self.sprites = []
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.w = np.zeros(capacity, dtype=np.int32)
+        self.h = np.zeros(capacity, dtype=np.int32)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        # Camera divisor, > 1 for clouds
+        self.parallax = np.ones(capacity)
+        self.layer = np.zeros(capacity, dtype=np.int8)
+        self.visible = np.zeros(capacity, dtype=bool)
+        # Mobs showing their up image
+        self.up = np.zeros(capacity, dtype=bool)
+
+
+    def __len__(self):
+        return self.n
+
+
+    def grow(self):
+        for name in ('x', 'y', 'w', 'h', 'vx', 'vy', 'dy', 'parallax', 'layer', 'visible', 'up'):
+            old = getattr(self, name)
+            new = np.zeros(len(old) * 2, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.parallax[self.n:] = 1
+
+
+    def add(self, sprite, layer, vx=0, vy=0, dy=0, up=False):
+        """Track a sprite, taking its current rect as its position."""
+        if self.n == len(self.x):
+            self.grow()
+        i = self.n
+        self.x[i], self.y[i] = sprite.rect.topleft
+        self.w[i], self.h[i] = sprite.rect.size
+        self.vx[i], self.vy[i], self.dy[i] = vx, vy, dy
+        self.parallax[i] = sprite.parallax
+        self.layer[i] = layer
+        self.visible[i] = True
+        self.up[i] = up
+        self.sprites.append(sprite)
+        sprite.slot = i
+        self.n += 1
+
+
+    def remove(self, sprite):
+        # Swap the last entity into the freed slot to keep arrays dense
+        i = sprite.slot
+        if i is None:
+            return
+        last = self.n - 1
+        if i != last:
+            for arr in (self.x, self.y, self.w, self.h, self.vx, self.vy,
+                        self.dy, self.parallax, self.layer, self.visible, self.up):
+                arr[i] = arr[last]
+            moved = self.sprites[last]
+            self.sprites[i] = moved
+            moved.slot = i
+        self.sprites.pop()
+        self.parallax[last] = 1
+        sprite.slot = None
+        self.n = last
+
+
+    def set_size(self, sprite):
+        self.w[sprite.slot], self.h[sprite.slot] = sprite.rect.size
+
+
+    def kill(self, mask):
+        dead = [self.sprites[i] for i in np.flatnonzero(mask)]
+        for sprite in dead:
+            sprite.kill()
+        return len(dead)
+
+
+    def screen_y(self, camera):
+        n = self.n
+        return self.y[:n] - camera // self.parallax[:n]
+
+
+    def update(self, camera):
+        """Per frame drift of clouds and mobs, replaces their update()."""
+        n = self.n
+        layer = self.layer[:n]
+        x, y = self.x[:n], self.y[:n]
+        w = self.w[:n]
+
+        x += self.vx[:n]
+        clouds = layer == CLOUD_LAYER
+        wrap = clouds & (x > WIDTH)
+        x[wrap] = -50 - w[wrap]
+
+        # Mobs bob up and down exactly as Mob.update moves their rects:
+        # the image follows dy and keeps its centre when it changes size,
+        # and y is rounded half away from zero like a Rect does
+        mobs = layer == MOB_LAYER
+        if mobs.any():
+            vy, dy, up = self.vy[:n], self.dy[:n], self.up[:n]
+            vy[mobs] += dy[mobs]
+            turn = mobs & ((vy > 3) | (vy < -3))
+            dy[turn] *= -1
+            h = self.h[:n]
+            for i in np.flatnonzero(mobs & (up != (dy < 0))):
+                cx, cy = x[i] + w[i] // 2, y[i] + h[i] // 2
+                up[i] = dy[i] < 0
+                self.sprites[i].face(up[i])
+                x[i], y[i] = cx - w[i] // 2, cy - h[i] // 2
+            moved = y[mobs] + vy[mobs]
+            y[mobs] = np.copysign(np.floor(np.abs(moved) + 0.5), moved)
+
+        self.kill((clouds & (self.screen_y(camera) > HEIGHT * 2)) |
+                  (mobs & ((x > WIDTH + 100) | (x + w < -100))))
+
+
+    def sync(self, camera):
+        """Write positions back to rects of sprites on screen, or just left it."""
+        n = self.n
+        x, y = self.x[:n], self.y[:n]
+        top = self.screen_y(camera)
+        visible = ((x < WIDTH) & (x + self.w[:n] > 0) &
+                   (top < HEIGHT) & (top + self.h[:n] > 0))
+        xs, ys = np.rint(x).astype(int), np.rint(y).astype(int)
+        sprites = self.sprites
+        for i in np.flatnonzero(visible | self.visible[:n]):
+            sprites[i].rect.topleft = xs[i], ys[i]
+        self.visible[:n] = visible
@@ -0,0 +1,180 @@
+# Gym-style batch of headless games for training agents.
+# K independent HeadlessGames are stepped in one process. Each game keeps
+# its own copy of the global random state, so every instance plays exactly
+# like a single seeded game would. Nothing here opens a window.
+#
+#   env = VecEnv(8)
+#   obs = env.reset(seed=0)
+#   obs, rewards, dones, infos = env.step(actions)
+import random
+
+import numpy as np
+
+# headless sets up the dummy SDL drivers before pygame is imported
+from headless import HeadlessGame
+import pygame as pg
+
+from settings import *
+
+# Discrete actions, as the keys held during the step
+ACTIONS = (
+    (),
+    (pg.K_LEFT,),
+    (pg.K_RIGHT,),
+    (pg.K_UP,),
+    (pg.K_LEFT, pg.K_UP),
+    (pg.K_RIGHT, pg.K_UP),
+)
+
+# How many of the nearest platforms, mobs and powerups go in a feature vector
+NEAR_PLATFORMS = 5
+NEAR_MOBS = 2
+NEAR_POWS = 2
+
+PLAYER_FEATURES = 7
+FEATURES = PLAYER_FEATURES + 3 * NEAR_PLATFORMS + 3 * NEAR_MOBS + 4 * NEAR_POWS
+
+
+class VecEnv:
+    """K games behind a reset(seed)/step(actions) interface.
+
+    obs='features' returns float32 arrays of shape (K, FEATURES), positions
+    relative to the player and scaled by the screen size. obs='pixels'
+    renders every game offscreen and returns uint8 arrays of shape
+    (K, HEIGHT // scale, WIDTH // scale, 3). The reward is the score gained
+    in the step. A finished game is reset right away and its last result
+    is in infos.
+    """
+    def __init__(self, num_envs, obs='features', scale=4, frame_skip=1,
+                 max_ticks=60 * 60 * 5, entity_store=False):
+        if obs not in ('features', 'pixels'):
+            raise ValueError(f'unknown observation type {obs!r}')
+        self.num_envs = num_envs
+        self.obs_type = obs
+        self.scale = scale
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.games = [HeadlessGame() for i in range(num_envs)]
+        for game in self.games:
+            game.use_entity_store = entity_store
+            # Each game draws to its own surface, the display is shared
+            game.screen = pg.Surface((WIDTH, HEIGHT))
+        self.rng_states = [None] * num_envs
+        self.seeds = [None] * num_envs
+        if obs == 'features':
+            self.observation_shape = (FEATURES,)
+            self.buf = np.zeros((num_envs, FEATURES), np.float32)
+        else:
+            self.observation_shape = (len(range(0, HEIGHT, scale)),
+                                      len(range(0, WIDTH, scale)), 3)
+            self.buf = np.zeros((num_envs, *self.observation_shape), np.uint8)
+        self.action_count = len(ACTIONS)
+
+    def reset(self, seed=None):
+        """Start every game, env i on seed + i, and return the observations."""
+        for i in range(self.num_envs):
+            self._reset_one(i, None if seed is None else seed + i)
+        return self.buf.copy()
+
+    def _reset_one(self, i, seed):
+        game = self.games[i]
+        random.seed(seed)
+        self.seeds[i] = seed
+        game.reset()
+        self.rng_states[i] = random.getstate()
+        self._observe(i)
+
+    def step(self, actions):
+        """Hold actions[i] on game i for frame_skip ticks.
+
+        Returns (obs, rewards, dones, infos).
+        """
+        rewards = np.zeros(self.num_envs, np.float32)
+        dones = np.zeros(self.num_envs, bool)
+        infos = [None] * self.num_envs
+        for i, game in enumerate(self.games):
+            game.input.set_keys(ACTIONS[actions[i]])
+            random.setstate(self.rng_states[i])
+            score = game.score
+            for tick in range(self.frame_skip):
+                game.step()
+                if not game.playing or game.ticks >= self.max_ticks:
+                    dones[i] = True
+                    break
+            self.rng_states[i] = random.getstate()
+            rewards[i] = game.score - score
+            if dones[i]:
+                infos[i] = {'seed': self.seeds[i], 'score': game.score,
+                            'ticks': game.ticks, 'death': game.death,
+                            'powerups': dict(game.pows_taken)}
+                # Carry on with a fresh seed from this game's own stream
+                seed = None if self.seeds[i] is None else self.seeds[i] + self.num_envs
+                self._reset_one(i, seed)
+            else:
+                self._observe(i)
+        return self.buf.copy(), rewards, dones, infos
+
+    def _observe(self, i):
+        if self.obs_type == 'features':
+            self._features(self.games[i], self.buf[i])
+        else:
+            self._pixels(self.games[i], self.buf[i])
+
+    def _features(self, game, out):
+        out.fill(0)
+        player = game.player
+        px, py = player.pos
+        out[:PLAYER_FEATURES] = (px / WIDTH, (py - game.camera) / HEIGHT,
+                                 player.vel.x / PLAYER_ACC / 10, player.vel.y / PLAYER_JUMP,
+                                 player.jumping, player.is_shield, player.jump_boost)
+        k = PLAYER_FEATURES
+        k = self._nearest(game.platforms, px, py, NEAR_PLATFORMS, out, k, 3)
+        k = self._nearest(game.mobs, px, py, NEAR_MOBS, out, k, 3)
+        self._nearest(game.powerups, px, py, NEAR_POWS, out, k, 4)
+
+    def _nearest(self, group, px, py, count, out, k, width):
+        # (dx, dy, size or kind, present) of the closest sprites, padded with 0
+        near = sorted(group, key=lambda s: (s.rect.centerx - px) ** 2 +
+                      (s.rect.centery - py) ** 2)[:count]
+        for sprite in near:
+            rect = sprite.rect
+            out[k] = (rect.centerx - px) / WIDTH
+            out[k + 1] = (rect.centery - py) / HEIGHT
+            if width == 4:
+                out[k + 2] = (POW_TYPES.index(sprite.type) + 1) / len(POW_TYPES)
+                out[k + 3] = 1
+            else:
+                out[k + 2] = rect.width / WIDTH
+            k += width
+        return k + width * (count - len(near))
+
+    def _pixels(self, game, out):
+        screen = game.screen
+        game.view = game.camera
+        game.render()
+        # pixels3d is a view of the surface; striding it downscales for free
+        view = pg.surfarray.pixels3d(screen)
+        out[...] = view[::self.scale, ::self.scale].transpose(1, 0, 2)
+        del view
+
+    def close(self):
+        for game in self.games:
+            game.profiler.close()
+            game.loader.close()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    obs_type = sys.argv[1] if len(sys.argv) > 1 else 'features'
+    env = VecEnv(8, obs=obs_type)
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    steps = 2000
+    start = time.perf_counter()
+    for step in range(steps):
+        env.step(rng.integers(env.action_count, size=env.num_envs))
+    elapsed = time.perf_counter() - start
+    print(f'{obs_type}: {steps * env.num_envs / elapsed:.0f} env-steps/s')
+    env.close()
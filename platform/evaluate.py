@@ -0,0 +1,186 @@
+# Batch evaluation of seeded headless games across all CPU cores.
+# Each worker process keeps one HeadlessGame and plays chunks of seeds with
+# a named policy from bots.py. Settings can be overridden per run, which is
+# how balance constants like MOB_FREQ or BOOST_POWER get tuned:
+#
+#   python evaluate.py --games 500 --policy dodger --set MOB_FREQ=3000,5000,8000
+import argparse
+import ast
+import itertools
+import json
+import os
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import settings
+from settings import *
+from headless import HeadlessGame, play
+from bots import make_policy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Settings that are read once at import time, as class attributes, in
+# tables built from them or in other settings, so overriding them per run
+# would not take effect. Everything else is read when a game is built or
+# played; keep it that way (no settings as default arguments).
+FIXED_SETTINGS = frozenset((
+    'WIDTH', 'HEIGHT',  # PLATFORM_LIST
+    'PLAYER_LAYER', 'PLATFORM_LAYER', 'POW_LAYER', 'MOB_LAYER', 'CLOUD_LAYER',
+    'PLAYER_STAND_FRAMES', 'PLAYER_WALK_FRAMES', 'PLAYER_JUMP_FRAME', 'SHIELD_FRAME',
+    'PLATFORM_FRAMES', 'POW_TYPES', 'POW_FRAMES', 'MOB_UP_FRAME', 'MOB_DOWN_FRAME',
+    'GAME_FRAMES',
+))
+
+# Per worker process state
+_game = None
+_game_overrides = None
+_defaults = {}
+
+
+def check_setting(name):
+    """Raise ValueError unless apply_overrides() can change the setting."""
+    if not name.isupper() or not hasattr(settings, name):
+        raise ValueError(f'unknown setting {name}')
+    if name in FIXED_SETTINGS:
+        raise ValueError(f'{name} is fixed at import time and cannot be overridden')
+
+
+def apply_overrides(overrides):
+    """Set settings constants in every game module, undoing earlier ones.
+
+    The modules use `from settings import *`, so each holds its own copy
+    of the constants and all of them have to be patched.
+    """
+    for name in overrides:
+        check_setting(name)
+    modules = [module for module in list(sys.modules.values())
+               if os.path.dirname(os.path.abspath(getattr(module, '__file__', None) or '')) == HERE]
+    for name in set(_defaults) | set(overrides):
+        if name not in _defaults:
+            _defaults[name] = getattr(settings, name)
+        value = overrides.get(name, _defaults[name])
+        for module in modules:
+            if hasattr(module, name):
+                setattr(module, name, value)
+
+
+def _get_game(overrides):
+    global _game, _game_overrides
+    if _game is None or overrides != _game_overrides:
+        if _game is not None:
+            _game.loader.close()
+        apply_overrides(overrides)
+        # Start from a new game, some constants are read at load time
+        _game = HeadlessGame()
+        _game_overrides = overrides
+        # Everything is decoded up front, the loader's threads can go
+        _game.finish_loading()
+        _game.loader.close()
+    return _game
+
+
+def _run(task):
+    overrides, policy, seeds, max_ticks = task
+    game = _get_game(overrides)
+    bot = make_policy(policy)
+    return [play(game, bot, seed, max_ticks) for seed in seeds]
+
+
+def evaluate(seeds, policy='climber', overrides=None, workers=None,
+             max_ticks=60 * 60 * 5, executor=None):
+    """Play one game per seed and return the results in seed order."""
+    overrides = dict(overrides or {})
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps the cores busy without much IPC
+    size = max(1, -(-len(seeds) // (workers * 4)))
+    tasks = [(overrides, policy, seeds[i:i + size], max_ticks)
+             for i in range(0, len(seeds), size)]
+    if workers == 1 and executor is None:
+        return [result for task in tasks for result in _run(task)]
+    if executor is not None:
+        chunks = executor.map(_run, tasks)
+        return [result for chunk in chunks for result in chunk]
+    with ProcessPoolExecutor(workers) as pool:
+        return [result for chunk in pool.map(_run, tasks) for result in chunk]
+
+
+def summarize(results):
+    """Aggregate play() results: scores, survival, powerups and deaths."""
+    scores = sorted(result['score'] for result in results)
+    ticks = [result['ticks'] for result in results]
+    deaths = {}
+    for result in results:
+        cause = result['death'] or 'survived'
+        deaths[cause] = deaths.get(cause, 0) + 1
+    powerups = {kind: sum(result['powerups'][kind] for result in results) / len(results)
+                for kind in POW_TYPES}
+    return {
+        'games': len(results),
+        'score_mean': statistics.fmean(scores),
+        'score_median': statistics.median(scores),
+        'score_p90': scores[int(0.9 * (len(scores) - 1))],
+        'score_max': scores[-1],
+        'ticks_mean': statistics.fmean(ticks),
+        'powerups_mean': powerups,
+        'deaths': deaths,
+    }
+
+
+def parse_assignment(text):
+    """NAME=V1[,V2...] -> (name, values), the values as Python literals.
+
+    For a setting that is a tuple itself, each value is a tuple:
+    PLATFORM_GAP=(20, 40) is one value, PLATFORM_GAP=(20, 40),(50, 90) two.
+    """
+    name, _, text = text.partition('=')
+    try:
+        check_setting(name)
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError) as error:
+        raise argparse.ArgumentTypeError(f'{name}: {error}')
+    if isinstance(getattr(settings, name), tuple):
+        several = isinstance(value, tuple) and all(isinstance(v, tuple) for v in value)
+    else:
+        several = isinstance(value, tuple)
+    return name, list(value) if several and value else [value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play seeded headless games with a bot.')
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--policy', default='climber')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-ticks', type=int, default=60 * 60 * 5)
+    parser.add_argument('--set', dest='sweep', type=parse_assignment, action='append',
+                        default=[], metavar='NAME=V1[,V2...]',
+                        help='override a setting; several values sweep over them')
+    parser.add_argument('--json', help='write every configuration summary here')
+    args = parser.parse_args(argv)
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    names = [name for name, values in args.sweep]
+    reports = []
+    with ProcessPoolExecutor(args.workers) as pool:
+        for values in itertools.product(*(values for name, values in args.sweep)):
+            overrides = dict(zip(names, values))
+            results = evaluate(seeds, args.policy, overrides, args.workers,
+                               args.max_ticks, executor=pool)
+            summary = summarize(results)
+            reports.append({'policy': args.policy, 'overrides': overrides, **summary})
+            label = ' '.join(f'{name}={value}' for name, value in overrides.items()) or 'defaults'
+            deaths = ', '.join(f'{cause} {count}' for cause, count in sorted(summary['deaths'].items()))
+            pows = ', '.join(f"{kind} {n:.2f}" for kind, n in summary['powerups_mean'].items())
+            print(f"{label}: score mean {summary['score_mean']:.0f} "
+                  f"median {summary['score_median']:.0f} p90 {summary['score_p90']} "
+                  f"max {summary['score_max']} | ticks {summary['ticks_mean']:.0f} "
+                  f"| powerups/game {pows} | deaths {deaths}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Headless simulation of the game loop.
+# Runs Game.update at a fixed timestep with no window and no mixer, as fast
+# as the CPU allows. Used for balance testing, bots and benchmarks.
+import os
+import random
+
+# Must be set before pygame opens a display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame as pg
+
+from settings import *
+from main import Game
+from engine import FixedClock, ScriptedInput
+from scores import ScoreBoard
+from display import Display
+from audio import SoundManager
+
+
+class HeadlessGame(Game):
+    def __init__(self, clock=None, input=None):
+        """Initialize an offscreen game, no window or mixer."""
+        super().__init__(clock or FixedClock(), input or ScriptedInput())
+
+
+    def init_display(self):
+        pg.display.init()
+        pg.font.init()
+        # The dummy driver still needs a display mode for convert()
+        self.display = Display((WIDTH, HEIGHT), fullscreen=False, scaled=False)
+        self.screen = self.display.screen
+
+
+    def load_scores(self):
+        # Bot runs never touch the score log
+        self.scores = ScoreBoard(None)
+
+
+    def load_sounds(self):
+        self.snd_dir = os.path.join(self.dir, 'snd')
+
+
+    def set_sounds(self):
+        self.sounds = SoundManager(self)
+
+
+    def play_music(self, name, volume=1.0):
+        pass
+
+
+    def stop_music(self, fade_ms):
+        pass
+
+
+    def reset(self):
+        # Every game starts at t=0 with no keys held, so seeded runs repeat
+        if isinstance(self.clock, FixedClock):
+            self.clock.reset()
+        if isinstance(self.input, ScriptedInput):
+            self.input.reset()
+        super().reset()
+
+
+def play(game, policy=None, seed=None, max_ticks=60 * 60 * 5):
+    """Play one game to the end (or max_ticks) and return its result.
+
+    policy(game, input) is called before every tick and may press or
+    release keys on the game's ScriptedInput. A policy with a reset(seed)
+    method is reset before the game starts.
+    """
+    if seed is not None:
+        if hasattr(game, 'random_state'):
+            # A fork draws from a random state of its own
+            game.random_state = random.Random(seed).getstate()
+        else:
+            random.seed(seed)
+    if hasattr(policy, 'reset'):
+        policy.reset(seed)
+    game.reset()
+    while game.playing and game.ticks < max_ticks:
+        if policy is not None:
+            policy(game, game.input)
+        game.step()
+    return {'seed': seed, 'score': game.score, 'ticks': game.ticks,
+            'alive': game.playing, 'death': game.death,
+            'powerups': dict(game.pows_taken)}
+
+
+if __name__ == '__main__':
+    import time
+
+    game = HeadlessGame()
+    start = time.perf_counter()
+    ticks = 0
+    for seed in range(20):
+        ticks += play(game, seed=seed)['ticks']
+    elapsed = time.perf_counter() - start
+    print(f'{ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s)')
@@ -0,0 +1,102 @@
+# Procedural platform generator.
+# Platforms are planned as a chain, each one placed relative to the one
+# below it: the vertical gap is drawn straight from the range a jump can
+# clear, and the horizontal position from the range the player can cover
+# while still above that height. Every platform is therefore reachable
+# from the previous one by construction, with no rerolls. Planning is O(1)
+# per platform and runs ahead of the scroll, in the idle time after a
+# frame is drawn. It draws from its own RNG, seeded by the game, so
+# planning between ticks never moves the game's random stream.
+import random
+from collections import deque
+
+from settings import *
+
+
+def jump_reach():
+    """reach[h]: how far sideways the player gets, starting from rest, while
+    its feet are still at least h pixels above where the jump started.
+
+    Follows the integration in Player.update exactly.
+    """
+    vel_x = vel_y = x = y = 0.0
+    vel_y = -PLAYER_JUMP
+    path = []
+    while True:
+        acc_x = PLAYER_ACC + vel_x * PLAYER_FRICTION
+        vel_x += acc_x
+        vel_y += GRAVITY
+        x += vel_x + 0.5 * acc_x
+        y += vel_y + 0.5 * GRAVITY
+        if vel_y > 0 and y > 0:
+            break
+        path.append((-y, x))
+    reach = [0.0] * (int(max(h for h, x in path)) + 1)
+    # x only grows, so the last tick at or above a height wins
+    for height, x in path:
+        for h in range(int(height) + 1):
+            reach[h] = x
+    return reach
+
+
+class PlatformGenerator:
+    def __init__(self, game, gap=None, lookahead=None):
+        if gap is None:
+            gap = PLATFORM_GAP
+        if lookahead is None:
+            lookahead = HEIGHT
+        self.game = game
+        self.rng = random.Random()
+        self.reach = jump_reach()
+        # Keep a safety margin under the highest jump
+        self.max_gap = min(gap[1], MAX_DISTANCE_BETWEEN_PLATFORMS, len(self.reach) - 10)
+        self.min_gap = min(gap[0], self.max_gap)
+        self.widths = {name: game.spritesheet.get_frame(name).get_width()
+                       for name in PLATFORM_FRAMES}
+        # Planned platforms: (frame, left, gap to the previous one)
+        self.queue = deque()
+        self.lookahead = max(1, int(lookahead // self.min_gap))
+
+
+    def start(self, platform, seed=None):
+        """Chain new platforms above the given (topmost) one."""
+        self.rng.seed(seed)
+        self.top = platform
+        self.left, self.right = platform.rect.left, platform.rect.right
+        self.queue.clear()
+        self.fill()
+
+
+    def plan(self):
+        rng = self.rng
+        frame = rng.choice(PLATFORM_FRAMES)
+        width = self.widths[frame]
+        gap = rng.randint(self.min_gap, self.max_gap)
+        reach = int(self.reach[gap] * REACH_MARGIN)
+        # Overlap the previous platform's span widened by the reach
+        lo = max(0, self.left - reach - width)
+        hi = min(WIDTH - width, self.right + reach)
+        left = int(rng.uniform(lo, hi))
+        self.queue.append((frame, left, gap))
+        self.left, self.right = left, left + width
+
+
+    def fill(self):
+        """Plan ahead, called when there is time to spare."""
+        while len(self.queue) < self.lookahead:
+            self.plan()
+
+
+    def spawn(self):
+        """Spawn planned platforms as they come within SPAWN_MARGIN of the screen."""
+        if not self.top.alive():
+            return
+        while True:
+            if not self.queue:
+                self.plan()
+            frame, left, gap = self.queue[0]
+            y = self.top.rect.top - gap
+            if y - self.game.camera < -SPAWN_MARGIN:
+                return
+            self.queue.popleft()
+            self.top = self.game.pools['platform'].spawn(left, int(y), frame)
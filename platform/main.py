@@ -7,99 +7,286 @@
 import pygame as pg
 import random
 import os
-from time import sleep
+from time import sleep, perf_counter
 
 from settings import *
 from sprites import *
+from engine import RealClock, FixedClock, KeyboardInput
+from entities import EntityStore
+from spatial import IndexedGroup, SpriteGroup
+from render import TextCache, RenderQueue, DirtyRenderer
+from pool import SpritePool
+from profiler import FrameProfiler
+from replay import Recorder
+from assets import AssetLoader
+from level import PlatformGenerator
+from scores import ScoreBoard
+from background import cloud_variants, ParallaxBackground
+from display import Display
+from audio import SoundManager
+from spectator import SpectatorServer, parse_address
 from os import path
 
 class Game:
-    def __init__(self):
+    def __init__(self, clock=None, input=None, record=None, serve=None):
         """Initialize game window, etc."""
-        pg.init()
-        pg.mixer.init()
-        self.screen = pg.display.set_mode((WIDTH, HEIGHT))
-        pg.display.set_caption(TITLE)
-        self.clock = pg.time.Clock()
+        self.init_display()
+        # Game time advances a fixed step per tick, the frame clock paces
+        # drawing in real time
+        self.clock = clock or FixedClock()
+        self.frame_clock = RealClock()
+        self.input = input or KeyboardInput()
+        # Real time span (perf_counter) of the tick being stepped, to place
+        # timestamped input within it; None when not running in real time
+        self.tick_window = None
+        # Stamps of the input events the current tick applies
+        self.input_stamps = []
+        self.use_entity_store = USE_ENTITY_STORE and EntityStore.available
         self.running = True
         self.font_name = pg.font.match_font(FONT_NAME)
+        self.text = TextCache(self.font_name)
+        self.profiler = FrameProfiler()
+        # record=path appends every game played to a replay log
+        self.recorder = Recorder(record) if record else None
+        # serve=[host:]port streams the game to spectators
+        self.server = SpectatorServer(*parse_address(serve)).start() if serve else None
         self.load_data()
+        self.renderer = DirtyRenderer(self) if DIRTY_RECTS else None
+        # Killed sprites are kept for reuse, across restarts too
+        self.pools = {'platform': SpritePool(self, Platform),
+                      'pow': SpritePool(self, Pow),
+                      'mob': SpritePool(self, Mob),
+                      'cloud': SpritePool(self, Cloud)}
+
+
+    def init_display(self):
+        pg.init()
+        pg.mixer.init()
+        # Channel 0 is kept for music
+        pg.mixer.set_reserved(1)
+        self.music_channel = pg.mixer.Channel(0)
+        self.display = Display()
+        self.screen = self.display.screen
+        pg.display.set_caption(TITLE)
+
+
+    def toggle_fullscreen(self):
+        """Reopen the display the other way and draw the next frame whole."""
+        self.display = Display(fullscreen=not self.display.fullscreen)
+        self.screen = self.display.screen
+        if self.renderer is not None:
+            self.renderer = DirtyRenderer(self)
 
 
     def load_data(self):
-        # Load high score
         self.dir = path.dirname(__file__)
-        file = path.join(self.dir, HS_FILE)
         img_dir = path.join(self.dir, 'img')
-
-        if not path.exists(file):
-            with open(file, 'w'): pass
-        with open(file, "r") as f:
-            try:
-                self.highscore = int(f.read())
-            except:
-                self.highscore = 0
-        # Load spritesheet image
-        self.spritesheet = Spritesheet(path.join(img_dir, SPRITESHEET))
-        # Cloud images
-        self.cloud_images = []
+        self.load_scores()
+        # Decode images and sounds in the background, see finish_loading()
+        self.loader = AssetLoader()
+        self.spritesheet = None
+        self.spritesheet_file = path.join(img_dir, SPRITESHEET)
+        self.loader.image('spritesheet', self.spritesheet_file)
         for i in range(1, 4):
-            self.cloud_images.append(pg.image.load(path.join(img_dir, f'cloud{i}.png')).convert())
+            self.loader.image(f'cloud{i}', path.join(img_dir, f'cloud{i}.png'))
         # Load sounds
+        self.load_sounds()
+
+
+    def load_scores(self):
+        # Every run is kept, old highscore.txt values are imported once
+        self.scores = ScoreBoard(path.join(self.dir, HS_FILE),
+                                 legacy=path.join(self.dir, HS_LEGACY_FILE))
+
+
+    def load_sounds(self):
         self.snd_dir = path.join(self.dir, 'snd')
-        self.jump_sound = pg.mixer.Sound(path.join(self.snd_dir, 'jump_sound1.wav'))
-        self.boost_sound = pg.mixer.Sound(path.join(self.snd_dir, 'Boost1.ogg'))
-        self.s_up_sound = pg.mixer.Sound(path.join(self.snd_dir, 'shieldUp.ogg'))
-        self.s_down_sound = pg.mixer.Sound(path.join(self.snd_dir, 'shieldDown.ogg'))
-        self.jump_boost_sound = pg.mixer.Sound(path.join(self.snd_dir, 'bunny_sound.ogg'))
-        self.alarm = pg.mixer.Sound(path.join(self.snd_dir, 'alarm_sound.wav'))
+        for name, file in SOUNDS.items():
+            self.loader.sound(name, path.join(self.snd_dir, file))
+        self.music_pending = None
+
+
+    def finish_loading(self):
+        """Wait for the background loader and set up the decoded assets."""
+        if self.spritesheet is not None:
+            return
+        if not self.loader.ready():
+            self.show_loading_screen()
+        self.spritesheet = Spritesheet(self.spritesheet_file, self.loader.get('spritesheet'))
+        self.spritesheet.preload(GAME_FRAMES)
+        self.platgen = PlatformGenerator(self)
+        self.cloud_images = [self.loader.get(f'cloud{i}').convert() for i in range(1, 4)]
+        self.cloud_variants = cloud_variants(self.cloud_images)
+        if PARALLAX_BACKGROUND:
+            self.background = ParallaxBackground(self.cloud_variants, (WIDTH, HEIGHT))
+        else:
+            self.background = None
+        self.set_sounds()
+
+
+    def set_sounds(self):
+        # mixer.Sound converts to the mixer's format when it is decoded,
+        # so nothing is resampled when a sound plays
+        self.sounds = SoundManager(self, {name: self.loader.get(name)
+                                          for name in SOUND_PRIORITY})
+
+
+    def play_music(self, name, volume=1.0):
+        """Loop a music track on the music channel once it is decoded."""
+        self.music_pending = (name, volume)
+        self.poll_music()
+
+
+    def poll_music(self):
+        if self.music_pending is None or not self.loader.ready(self.music_pending[0]):
+            return
+        name, volume = self.music_pending
+        self.music_pending = None
+        self.music_channel.set_volume(volume)
+        self.music_channel.play(self.loader.get(name), loops=-1)
+
+
+    def stop_music(self, fade_ms):
+        self.music_pending = None
+        self.music_channel.fadeout(fade_ms)
 
 
     def new(self):
         """Start a new game."""
+        # Every run is seeded, the seed goes in its score record
+        self.seed = random.randrange(1 << 32)
+        random.seed(self.seed)
+        if self.recorder is not None:
+            self.recorder.start(self, self.seed)
+        self.reset()
+        self.run()
+        if self.recorder is not None:
+            self.recorder.stop()
+
+
+    def reset(self):
+        """Set up the world for a new game without running it."""
+        self.finish_loading()
+        self.ticks = 0
+        self.start_time = self.clock.get_ticks()
         self.score = 0
         self.scroll = 0
-        self.last_height = 0
-        self.all_sprites = pg.sprite.LayeredUpdates()
-        self.platforms = pg.sprite.Group()
-        self.powerups = pg.sprite.Group()
-        self.mobs = pg.sprite.Group()
-        self.clouds = pg.sprite.Group()
-        self.player = Player(self)
+        # Why the last game ended ('mob' or 'fall') and the powerups it took
+        self.death = None
+        self.pows_taken = dict.fromkeys(POW_TYPES, 0)
+        # World y at the top of the screen; scrolling moves only this
+        self.camera = 0
+        self.view = 0
+        self.new_world()
         for plat in PLATFORM_LIST:
-            Platform(self, *plat)
+            top = self.pools['platform'].spawn(*plat)
+        # The level is also planned between ticks, so it has its own RNG:
+        # the game's stream only moves inside a tick and replays stay exact
+        self.platgen.start(top, random.getrandbits(32))
         self.mob_timer = 0
-        pg.mixer.music.load(path.join(self.snd_dir, 'Happy Tune.ogg'))
-        for i in range(8):
-            c = Cloud(self)
-            c.rect.y += 500
+        self.last_positions = []
+        self.last_camera = 0
+        # Clouds have their own RNG, so how they are drawn can't change the level
+        self.scenery = random.Random(random.getrandbits(32))
+        if self.background is not None:
+            self.background.reset()
+        else:
+            for i in range(8):
+                self.pools['cloud'].spawn(500)
+        self.playing = True
 
-        self.run()
+
+    def new_world(self):
+        """Empty sprite groups and a new player, the old sprites are pooled."""
+        if hasattr(self, 'all_sprites'):
+            for sprite in self.all_sprites.sprites():
+                sprite.kill()
+        self.all_sprites = RenderQueue()
+        self.entities = EntityStore() if self.use_entity_store else None
+        group = IndexedGroup if SPATIAL_INDEX else SpriteGroup
+        self.platforms = group()
+        self.powerups = group()
+        self.mobs = group(moving=True)
+        self.clouds = pg.sprite.Group()
+        self.player = Player(self)
 
 
     def run(self):
         """Game loop."""
-        pg.mixer.music.play(loops=-1)
+        self.play_music('game_music')
         self.playing = True
+        step = 1000 / FPS
+        lag = 0.0
+        # Take input off the queue while waiting for the next frame
+        idle = getattr(self.input, 'poll', None)
+        self.frame_clock.tick()
         while self.playing:
-            self.clock.tick(FPS)
-            self.events()
-            self.update()
-            self.draw()
-        pg.mixer.music.fadeout(500)
+            lag += self.frame_clock.tick(DISPLAY_FPS, idle)
+            now = perf_counter()
+            self.profiler.begin()
+            # Catch up in whole ticks; after a long stall drop the rest
+            # instead of falling further behind every frame
+            steps = 0
+            while lag >= step and self.playing:
+                if steps == MAX_FRAME_STEPS:
+                    lag %= step
+                    break
+                if INTERPOLATE:
+                    self.save_positions()
+                end = now - (lag - step) / 1000
+                self.tick_window = (end - step / 1000, end)
+                self.step()
+                lag -= step
+                steps += 1
+            self.draw(lag / step if INTERPOLATE else 1.0)
+            self.profiler.lap('draw')
+            self.profiler.input_shown()
+            # Plan the next platforms before the clock sleeps
+            self.platgen.fill()
+        self.tick_window = None
+        self.stop_music(500)
+
+
+    def step(self):
+        """Advance the simulation by one tick, without drawing."""
+        self.clock.tick(FPS)
+        self.events()
+        self.profiler.lap('events')
+        self.update()
+        if self.input_stamps:
+            self.profiler.input_applied(self.input_stamps)
+            self.input_stamps = []
+        self.ticks += 1
+        if self.server is not None:
+            self.server.publish(self)
 
 
     def update(self):
         """Game loop - Update."""
-        self.all_sprites.update()
+        if self.entities is not None:
+            # Mobs and clouds are moved by the store
+            self.player.update()
+            self.powerups.update()
+            self.entities.update(self.camera)
+            self.entities.sync(self.camera)
+        else:
+            # Platforms never move, only the rest is updated
+            self.clouds.update()
+            self.powerups.update()
+            self.player.update()
+            self.mobs.update()
+        if self.background is not None:
+            self.background.update()
+        self.profiler.lap('sprites')
 
         # Spawn a mob
-        now = pg.time.get_ticks()
+        now = self.clock.get_ticks()
         if now - self.mob_timer > MOB_FREQ + random.choice([-1000, -500, 0, 500, 1000]):
             self.mob_timer = now
-            Mob(self)
+            self.pools['mob'].spawn()
+        self.profiler.lap('spawn')
         # Mob collision
-        mob_hits = pg.sprite.spritecollide(self.player, self.mobs, False, pg.sprite.collide_mask)
+        mob_hits = self.mobs.spritecollide(self.player, False, pg.sprite.collide_mask)
         if mob_hits:
             if self.player.is_shield == True:
                 for mob in mob_hits:
@@ -110,10 +297,11 @@ class Game:
                         pass
                     else:
                         self.playing = False
+                        self.death = 'mob'
 
         # Check if player hits a platform only if falling
         if self.player.vel.y > 0:
-            hits = pg.sprite.spritecollide(self.player, self.platforms, False)
+            hits = self.platforms.spritecollide(self.player)
             if hits:
                 lowest = hits[0]
                 for hit in hits:
@@ -125,97 +313,191 @@ class Game:
                         self.player.pos.y = lowest.rect.top + 1
                         self.player.vel.y = 0
                         self.player.jumping = False
+        self.profiler.lap('collisions')
 
         # If player reaches top 1/4 of screen
-        if self.player.rect.top <= HEIGHT / 4:
-            if random.randrange(100) < 10:
-                Cloud(self)
-            self.scroll += max(abs(self.player.vel.y), 2)
-            self.player.pos.y += max(abs(self.player.vel.y), 2)
-            for cloud in self.clouds:
-                cloud.rect.y += max(abs(self.player.vel.y / cloud.speedy), 2)
-            for mob in self.mobs:
-                mob.rect.y += max(abs(self.player.vel.y), 2)
-            for plat in self.platforms:
-                plat.rect.y += max(abs(self.player.vel.y), 2)
-                if plat.rect.top >= HEIGHT:
-                    plat.kill()
-                    self.score += 10
+        if self.player.rect.top - self.camera <= HEIGHT / 4:
+            if self.background is None and self.scenery.randrange(100) < 10:
+                self.pools['cloud'].spawn()
+            scroll = max(abs(self.player.vel.y), 2)
+            self.scroll += scroll
+            self.camera -= int(scroll + 0.5)
+            if self.background is not None:
+                self.background.scroll(scroll)
+            # Only the platforms that dropped off the bottom are touched
+            for plat in self.platforms.below(self.camera + HEIGHT):
+                plat.kill()
+                self.score += 10
+            if self.entities is not None:
+                self.entities.sync(self.camera)
+        self.profiler.lap('scroll')
 
         # If player hits a powerup
-        pow_hits = pg.sprite.spritecollide(self.player, self.powerups, True)
+        pow_hits = self.powerups.spritecollide(self.player, True)
         for pow in pow_hits:
+            self.pows_taken[pow.type] += 1
             if pow.type == 'boost':
-                self.boost_sound.play()
+                self.sounds.play('boost')
                 self.player.vel.y = - BOOST_POWER
                 self.player.jumping = False
             if pow.type == 'shield':
-                self.player.shield_time = pg.time.get_ticks()
+                self.player.shield_time = self.clock.get_ticks()
                 self.player.is_shield = True
-                self.s_up_sound.play()
+                self.sounds.play('shield_up')
             if pow.type == 'bunny':
-                self.player.jump_boost_time = pg.time.get_ticks()
+                self.player.jump_boost_time = self.clock.get_ticks()
                 self.player.jump_boost = True
                 self.player.boost_sound = True
-                self.jump_boost_sound.play()
+                self.sounds.play('bunny')
+        self.profiler.lap('collisions')
 
 
         # Die
-        if self.player.rect.bottom > HEIGHT:
-            for sprite in self.all_sprites:
-                sprite.rect.y -= max(self.player.vel.y, 10)
-                if sprite.rect.bottom < 10:
+        if self.player.rect.bottom - self.camera > HEIGHT:
+            fall = max(self.player.vel.y, 10)
+            self.camera += int(fall + 0.5)
+            if self.background is not None:
+                self.background.scroll(-fall)
+            top = self.camera + 10
+            for group in (self.platforms, self.powerups, self.mobs):
+                for sprite in group.above(top):
                     sprite.kill()
+            if self.entities is not None:
+                self.entities.sync(self.camera)
         if len(self.platforms) == 0:
             self.playing = False
+            self.death = 'fall'
+        self.profiler.lap('scroll')
 
         self.spawn_platforms()
+        self.profiler.lap('spawn')
 
 
     def events(self):
         """Game loop - Events."""
-        for event in pg.event.get():
+        for event in self.input.get_events():
+            if event.type in (pg.KEYDOWN, pg.KEYUP) and hasattr(event, 'time'):
+                self.input_stamps.append(event.time)
             if event.type == pg.QUIT:
                 if self.playing:
                     self.playing = False
                 self.running = False
             if event.type == pg.KEYDOWN:
                 if event.key == pg.K_UP:
-                    self.player.jump()
+                    self.player.jump(self.input_fraction(event))
+                if event.key == pg.K_F3:
+                    self.profiler.toggle()
+                if event.key == pg.K_F11:
+                    self.toggle_fullscreen()
             if event.type == pg.KEYUP:
                 if event.key == pg.K_UP:
-                    self.player.jump_cut()
+                    self.player.jump_cut(self.input_fraction(event))
+
+
+    def input_fraction(self, event):
+        """How far into the tick's real time span an event came, 0 to 1.
+
+        Rounded to 1/255 so a replay log keeps it in a byte. Replayed
+        events carry the recorded fraction already.
+        """
+        fraction = getattr(event, 'fraction', None)
+        if fraction is None:
+            fraction = 0.0
+            if self.tick_window is not None and hasattr(event, 'time'):
+                start, end = self.tick_window
+                fraction = min(1.0, max(0.0, (event.time - start) / (end - start)))
+                fraction = round(fraction * 255) / 255
+            event.fraction = fraction
+        return fraction
+
+
+    def draw(self, alpha=1.0):
+        """Game loop - Draw, alpha of the way from the last tick to the next."""
+        moved = self.interpolate(alpha) if alpha < 1.0 else ()
+        self.view = self.camera
+        if alpha < 1.0:
+            self.view = round(self.last_camera + (self.camera - self.last_camera) * alpha)
+        if self.renderer is not None:
+            self.renderer.draw(self.view)
+        else:
+            self.render()
+            self.display.flip()
+        # Put the sprites back where the simulation has them
+        for sprite, topleft in moved:
+            sprite.rect.topleft = topleft
 
 
-    def draw(self):
-        """Game loop - Draw."""
-        self.screen.fill(BG_COLOR)
-        self.all_sprites.draw(self.screen)
+    def render(self):
+        """Draw the whole frame as seen from self.view to self.screen."""
+        if self.background is not None:
+            self.background.draw(self.screen)
+        else:
+            self.screen.fill(BG_COLOR)
+        self.all_sprites.draw(self.screen, self.view)
+        if self.server is not None and self.server.ghosts:
+            self.draw_ghosts()
+        self.draw_hud()
+
+
+    def save_positions(self):
+        # Platforms and powerups stay put in the world, scrolling only
+        # moves the camera and draw() eases that on its own
+        self.last_camera = self.camera
+        sprites = [self.player] + self.mobs.sprites() + self.clouds.sprites()
+        self.last_positions = [(sprite, sprite.rect.topleft) for sprite in sprites]
+
+
+    def interpolate(self, alpha):
+        """Move sprites between their last two ticks, returns what to undo."""
+        moved = []
+        # Sprites killed since are moved too, they just aren't drawn
+        for sprite, old in self.last_positions:
+            x, y = topleft = sprite.rect.topleft
+            dx, dy = old[0] - x, old[1] - y
+            # Spawns, wraps and respawned pool sprites jump, don't smear them
+            if (dx or dy) and abs(dx) < 64 and abs(dy) < 64:
+                moved.append((sprite, topleft))
+                sprite.rect.topleft = (x + dx * (1 - alpha), y + dy * (1 - alpha))
+        return moved
+
+
+    def draw_ghosts(self):
+        """Draw the players streamed in by ghost clients, see spectator.py."""
+        image = self.server.ghost_image
+        self.screen.blits([(image(self, frame), (x, y - self.view))
+                           for x, y, frame in self.server.ghosts], False)
+
+
+    def draw_hud(self):
+        """Draw shield and score over the sprites, returns the rects drawn."""
+        batch = []
         if self.player.is_shield == True:
-            self.screen.blit(self.player.shield_icon, self.player.shield_rect)
-        self.draw_text(str(self.score), 22, 'white', WIDTH / 2, 15)
-        pg.display.flip()
+            batch.append((self.player.shield_icon, self.player.shield_rect.move(0, -self.view)))
+        score = self.text.render(str(self.score), 22, 'white')
+        batch.append((score, score.get_rect(midtop=(WIDTH / 2, 15))))
+        rects = self.screen.blits(batch)
+        if self.profiler.enabled:
+            rects.append(self.profiler.draw(self.screen, self.text.font(14)))
+        return rects
 
 
     def show_start_screen(self):
         """Game splash/start screen."""
-        pg.mixer.music.set_volume(0.5)
-        pg.mixer.music.load(path.join(self.snd_dir, 'Yippee.ogg'))
-        pg.mixer.music.play(loops=-1)
-
+        # Shown while the assets are still loading, the music joins in
+        # as soon as it is decoded
+        self.play_music('menu_music', 0.5)
 
         self.screen.fill(BG_COLOR)
         self.draw_text(TITLE, 48, 'white', WIDTH / 2, HEIGHT / 4)
         self.draw_text("Arrows to move, arrow up to jump",
             22, 'white', WIDTH / 2, HEIGHT / 2)
         self.draw_text("Press a key to play", 22, 'white', WIDTH / 2, HEIGHT * 3 / 4)
-        self.draw_text("High score : " + str(self.highscore), 22, 'white', WIDTH / 2, 15)
-        pg.display.flip()
+        self.draw_text("High score : " + str(self.scores.best()), 22, 'white', WIDTH / 2, 15)
+        self.display.flip()
         self.wait_for_key()
 
-        pg.mixer.music.fadeout(500)
+        self.stop_music(500)
         sleep(0.5)
-        pg.mixer.music.set_volume(1.0)
 
 
     def show_go_screen(self):
@@ -227,30 +509,38 @@ class Game:
         self.draw_text("Score: " + str(self.score),
             22, 'white', WIDTH / 2, HEIGHT / 2)
         self.draw_text("Press a key to play again", 22, 'white', WIDTH / 2, HEIGHT * 3 / 4)
-        if self.score > self.highscore:
-            self.highscore = self.score
+        best = self.scores.best()
+        duration = self.clock.get_ticks() - self.start_time
+        self.scores.add(self.score, duration, self.seed)
+        if self.score > best:
             self.draw_text("New Highscore!", 22, 'white', WIDTH / 2, HEIGHT / 2 + 40)
-            with open(path.join(self.dir, HS_FILE), 'w') as f:
-                f.write(str(self.score))
         else:
-            self.draw_text("Highscore: " + str(self.highscore), 22, 'white', WIDTH / 2, HEIGHT / 2 + 40)
+            self.draw_text("Highscore: " + str(best), 22, 'white', WIDTH / 2, HEIGHT / 2 + 40)
+            self.draw_text("Better than %d%% of runs" % self.scores.percentile(self.score),
+                22, 'white', WIDTH / 2, HEIGHT / 2 + 80)
 
-        pg.display.flip()
+        self.display.flip()
         self.wait_for_key()
 
 
     def draw_text(self, text, size, color, x, y):
-        font = pg.font.Font(self.font_name, size)
-        text_surface = font.render(text, True, color)
+        text_surface = self.text.render(text, size, color)
         text_rect = text_surface.get_rect()
         text_rect.midtop = (x, y)
-        self.screen.blit(text_surface, text_rect)
+        return self.screen.blit(text_surface, text_rect)
+
+
+    def show_loading_screen(self):
+        self.screen.fill(BG_COLOR)
+        self.draw_text("Loading...", 22, 'white', WIDTH / 2, HEIGHT / 2)
+        self.display.flip()
 
 
     def wait_for_key(self):
         waiting = True
         while waiting:
-            self.clock.tick(FPS)
+            self.frame_clock.tick(FPS)
+            self.poll_music()
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     waiting = False
@@ -261,27 +551,28 @@ class Game:
 
     def spawn_platforms(self):
         # Spawn new platforms
-        i = 0
-        while len(self.platforms) < 6:
-            width = random.randrange(50, 150)
-            height =  random.randrange(-75, -30)
-            while self.last_height + self.scroll - height > MAX_DISTANCE_BETWEEN_PLATFORMS:
-                if i > 100:
-                    height = 0
-                    break
-                height = random.randrange(-75, -30)
-                i += 1
-            Platform(self, random.randrange(0, WIDTH - width), height)
-            self.last_height = height
-            self.scroll = 0
-
-
-
-g = Game()
-g.show_start_screen()
-while g.running:
-    g.new()
-    g.show_go_screen()
-
-
-os.sys.exit(0)
+        self.platgen.spawn()
+
+
+
+if __name__ == '__main__':
+    # Only the window takes these from the environment, so headless games
+    # and worker processes never open the log or the port
+    g = Game(record=os.environ.get('JUMPER_RECORD'), serve=os.environ.get('JUMPER_SERVE'))
+    g.show_start_screen()
+    while g.running:
+        g.new()
+        g.show_go_screen()
+    g.profiler.close()
+    g.loader.close()
+    g.scores.close()
+    if g.profiler.enabled:
+        print('sounds:', g.sounds.stats())
+        print('input latency:', g.profiler.latency())
+    if g.recorder is not None:
+        g.recorder.close()
+    if g.server is not None:
+        g.server.close()
+
+
+    os.sys.exit(0)
@@ -0,0 +1,43 @@
+# Free lists of killed sprites, so spawning reuses instances instead of
+# allocating a new object, dict and rect for every platform, powerup, mob
+# and cloud.
+
+
+class SpritePool:
+    """Recycles killed sprites of one class.
+
+    The class is built as cls(game, *args) the first time and re-armed with
+    sprite.reset(*args) when reused. Killed sprites come back through
+    release(), called from WorldSprite.kill.
+    """
+    def __init__(self, game, cls, max_free=256):
+        self.game = game
+        self.cls = cls
+        self.max_free = max_free
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def spawn(self, *args):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.reused += 1
+        else:
+            sprite = self.cls(self.game, *args)
+            sprite.pool = self
+            self.created += 1
+        return sprite
+
+    def release(self, sprite):
+        self.released += 1
+        if len(self.free) < self.max_free:
+            self.free.append(sprite)
+
+    def stats(self):
+        spawned = self.created + self.reused
+        return {'live': spawned - self.released, 'free': len(self.free),
+                'created': self.created,
+                'reused': self.reused,
+                'reuse_rate': self.reused / spawned if spawned else 0.0}
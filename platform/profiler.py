@@ -0,0 +1,156 @@
+# Frame time profiler.
+# Times each part of the frame, keeps rolling p50/p95/p99 per part, draws
+# them as an overlay and can stream every frame to a CSV or JSONL file.
+# Alongside, it measures input latency from the time a key event was
+# taken off SDL's queue to the end of the update that applied it
+# (input>update) and to the flip that first showed it (input>flip).
+# Toggle with F3, or start enabled with JUMPER_PROFILE=1. Set
+# JUMPER_PROFILE_LOG=frames.csv (or .jsonl) to record frames to a file.
+# While disabled every hook is a single attribute check.
+import json
+import os
+from collections import deque
+from time import perf_counter
+
+import pygame as pg
+
+SECTIONS = ('events', 'sprites', 'collisions', 'scroll', 'spawn', 'draw')
+LATENCIES = ('input>update', 'input>flip')
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class FrameProfiler:
+    def __init__(self, enabled=None, log_path=None, window=300, refresh=30):
+        if enabled is None:
+            enabled = os.environ.get('JUMPER_PROFILE', '') not in ('', '0')
+        self.enabled = enabled
+        self.log_path = log_path or os.environ.get('JUMPER_PROFILE_LOG')
+        self.log = None
+        self.refresh = refresh
+        self.samples = {name: deque(maxlen=window) for name in SECTIONS + ('total',) + LATENCIES}
+        # Stamps of input applied but not on screen yet
+        self.unshown = []
+        self.stats = {}
+        self.frame = 0
+        self.current = None
+        self.last = 0.0
+        self.overlay = None
+
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current = None
+        if not self.enabled:
+            self.close()
+
+
+    def begin(self):
+        """Start timing a frame, closing the previous one."""
+        if not self.enabled:
+            return
+        if self.current is not None:
+            self.end()
+        self.current = dict.fromkeys(SECTIONS, 0.0)
+        self.last = perf_counter()
+
+
+    def lap(self, name):
+        """Charge the time since the last lap to a section."""
+        if self.current is None:
+            return
+        now = perf_counter()
+        self.current[name] += now - self.last
+        self.last = now
+
+
+    def end(self):
+        record = {name: t * 1000 for name, t in self.current.items()}
+        record['total'] = sum(record.values())
+        for name, ms in record.items():
+            self.samples[name].append(ms)
+        self.frame += 1
+        if self.log_path:
+            self.write(record)
+        if self.frame % self.refresh == 0:
+            self.stats = self.percentiles()
+            self.overlay = None
+        self.current = None
+
+
+    def input_applied(self, stamps):
+        """An update just applied input events with these perf_counter stamps."""
+        if not self.enabled:
+            return
+        now = perf_counter()
+        self.samples['input>update'].extend((now - t) * 1000 for t in stamps)
+        self.unshown.extend(stamps)
+
+
+    def input_shown(self):
+        """The frame just flipped shows all input applied so far."""
+        if not self.unshown:
+            return
+        now = perf_counter()
+        self.samples['input>flip'].extend((now - t) * 1000 for t in self.unshown)
+        self.unshown.clear()
+
+
+    def latency(self):
+        """p50/p95/p99/max in ms of the recent input latencies."""
+        stats = {}
+        for name in LATENCIES:
+            if self.samples[name]:
+                ordered = sorted(self.samples[name])
+                values = [percentile(ordered, p) for p in (50, 95, 99)] + [ordered[-1]]
+                stats[name] = tuple(round(ms, 2) for ms in values)
+        return stats
+
+
+    def percentiles(self):
+        stats = {}
+        for name, samples in self.samples.items():
+            if samples:
+                ordered = sorted(samples)
+                stats[name] = tuple(percentile(ordered, p) for p in (50, 95, 99))
+        return stats
+
+
+    def write(self, record):
+        if self.log is None:
+            self.log = open(self.log_path, 'a', newline='')
+            self.csv = not self.log_path.endswith('.jsonl')
+            if self.csv and self.log.tell() == 0:
+                self.log.write(','.join(('frame',) + SECTIONS + ('total',)) + '\n')
+        if self.csv:
+            values = [str(self.frame)] + [f'{record[name]:.4f}' for name in SECTIONS + ('total',)]
+            self.log.write(','.join(values) + '\n')
+        else:
+            record['frame'] = self.frame
+            self.log.write(json.dumps(record) + '\n')
+
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+    def draw(self, screen, font):
+        """Blit the percentile table in the top left, returns its rect."""
+        if self.overlay is None:
+            rows = [('ms', 'p50', 'p95', 'p99')]
+            for name, values in self.stats.items():
+                rows.append((name,) + tuple(f'{ms:.2f}' for ms in values))
+            line = font.get_linesize()
+            self.overlay = pg.Surface((190, line * len(rows)))
+            for y, row in enumerate(rows):
+                self.overlay.blit(font.render(row[0], True, 'white'), (2, y * line))
+                # Right-align the numbers in 40px columns
+                for x, cell in enumerate(row[1:]):
+                    text = font.render(cell, True, 'white')
+                    self.overlay.blit(text, (108 + x * 40 - text.get_width(), y * line))
+            self.overlay.set_alpha(200)
+        return screen.blit(self.overlay, (5, 5))
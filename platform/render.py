@@ -0,0 +1,151 @@
+# Rendering: cached text, the layered render queue and the opt-in dirty
+# rect renderer.
+from collections import OrderedDict
+
+import pygame as pg
+
+from settings import *
+
+
+class TextCache:
+    """Fonts by size and rendered text surfaces, reused between frames."""
+    def __init__(self, font_name, max_surfaces=64):
+        self.font_name = font_name
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pg.font.Font(self.font_name, size)
+        return font
+
+    def render(self, text, size, color):
+        # The score is only re-rendered when its text changes
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.font(size).render(text, True, color)
+        if pg.display.get_surface() is not None:
+            # Antialiased text has per pixel alpha, blend it in screen format
+            surface = surface.convert_alpha()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+class RenderQueue(pg.sprite.AbstractGroup):
+    """Every sprite of the game, drawn back to front by layer.
+
+    Each layer is an insertion ordered dict, so adding or removing a
+    sprite is O(1). Sprites keep world coordinates and are drawn offset by
+    the camera (the world y at the top of the screen), divided by their
+    parallax for the far away ones.
+    """
+    def __init__(self, layers=max(PLAYER_LAYER, MOB_LAYER) + 1):
+        super().__init__()
+        self.layers = [{} for i in range(layers)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.layers[sprite._layer][sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.layers[sprite._layer][sprite]
+
+    def sprites(self):
+        """All sprites in draw order."""
+        return [sprite for layer in self.layers for sprite in layer]
+
+    def draw(self, surface, camera=0):
+        # One batch for the whole frame, still back to front
+        surface.blits([(sprite.image, (sprite.rect.x, sprite.rect.y - camera // sprite.parallax))
+                       for layer in self.layers for sprite in layer], False)
+
+
+def screen_rect(sprite, camera):
+    # The image can be larger than the rect (the player's jump frame)
+    rect = sprite.rect
+    return pg.Rect((rect.x, rect.y - camera // sprite.parallax), sprite.image.get_size())
+
+
+class DirtyRenderer:
+    """Draws only the sprites that changed and presents only those regions.
+
+    Works on the RenderQueue: a sprite is redrawn where it was and where
+    it is when its screen rect or image changed, or it has dirty set. A
+    frame where the camera moved shifts everything, so it is drawn whole.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.background = pg.Surface(game.screen.get_size()).convert()
+        self.background.fill(BG_COLOR)
+        # Screen rect and image of every sprite as drawn last frame
+        self.drawn = {}
+        self.camera = None
+        # Screen rects of the HUD drawn over the sprites last frame
+        self.hud_rects = []
+
+    def draw(self, camera):
+        game = self.game
+        screen = game.screen
+        sprites = game.all_sprites.sprites()
+        drawn = {sprite: (screen_rect(sprite, camera), sprite.image) for sprite in sprites}
+        ghosts = game.server is not None and game.server.ghosts
+        if camera != self.camera or game.background is not None or ghosts:
+            # The parallax layer moves every frame, so it is always whole,
+            # and so are frames with ghosts in them
+            if game.background is not None:
+                game.background.draw(screen)
+            else:
+                screen.blit(self.background, (0, 0))
+            screen.blits([(image, rect) for rect, image in drawn.values()], False)
+            if ghosts:
+                game.draw_ghosts()
+            self.finish(drawn, camera)
+            game.display.flip()
+            return
+        dirty = []
+        for sprite, (rect, image) in drawn.items():
+            old = self.drawn.pop(sprite, None)
+            if old is None:
+                dirty.append(rect)
+            elif sprite.dirty or old[0] != rect or old[1] is not image:
+                dirty.append(old[0])
+                dirty.append(rect)
+                if sprite.dirty == 1:
+                    sprite.dirty = 0
+        # Sprites gone since last frame
+        dirty.extend(rect for rect, image in self.drawn.values())
+        dirty = merge(dirty + self.hud_rects)
+        batch = [(self.background, area, area) for area in dirty]
+        for rect, image in drawn.values():
+            for i in rect.collidelistall(dirty):
+                clip = rect.clip(dirty[i])
+                batch.append((image, clip, clip.move(-rect.x, -rect.y)))
+        screen.blits(batch, False)
+        self.finish(drawn, camera)
+        game.display.update(dirty + self.hud_rects)
+
+    def finish(self, drawn, camera):
+        self.drawn = drawn
+        self.camera = camera
+        self.hud_rects = self.game.draw_hud()
+
+
+def merge(rects):
+    """Union overlapping rects, so no area is drawn twice."""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
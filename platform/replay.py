@@ -0,0 +1,277 @@
+# Input recording and replay.
+# A session is the RNG seed, the clock at the start and, for every tick,
+# one byte of input bits plus the clock delta in ms. Sessions are appended
+# to a binary log as they are played:
+#
+#   0xFF  seed:u32  start:u32  flags:u8     session start
+#   0xFD  press:u8  release:u8              sub-tick times of the next tick's
+#                                           jump press/release, in 1/255 ticks
+#   0xFC  count:u8  (release:u8  at:u8)*    every jump key event of the next
+#                                           tick in order, with its sub-tick time
+#   bits:u8  dt:u16                         one tick (bits < 0x80)
+#   0xFE  ticks:u32  score:u32              session end
+#
+# The bits hold one jump press and one release. A tick with more of
+# either, like a quick tap and press again, gets the 0xFC record and the
+# replay takes its events from that. Otherwise the sub-tick record is
+# only written when one of the times is not 0.
+#
+# Replaying a session drives a HeadlessGame with the recorded input and
+# clock, uncapped, and should end with the recorded score. Set
+# JUMPER_RECORD=path to record every game played in the window.
+import random
+import struct
+
+import pygame as pg
+
+from engine import HeldKeys
+
+HEADER = struct.Struct('<BIIB')
+TICK = struct.Struct('<BH')
+FOOTER = struct.Struct('<BII')
+FRACTIONS = struct.Struct('<BBB')
+JUMPS = struct.Struct('<BB')
+JUMP = struct.Struct('<BB')
+START, END, SUBTICK, SEQUENCE = 0xFF, 0xFE, 0xFD, 0xFC
+
+# Input bits
+LEFT, RIGHT, UP_HELD, UP_PRESS, UP_RELEASE, RELEASE_FIRST = (1 << i for i in range(6))
+# Session flags
+ENTITY_STORE = 1
+
+
+class Recorder:
+    """Wraps a game's clock and input, logging what they hand out."""
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.game = None
+
+    def start(self, game, seed=None):
+        """Seed the RNG and start logging; call before game.reset()."""
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        random.seed(seed)
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+        self.game = game
+        self.clock, self.input = game.clock, game.input
+        game.clock = game.input = self
+        self.ticks = 0
+        self.bits = None
+        self.jumps = []
+        self.time = self.clock.get_ticks()
+        self.delta = 0
+        flags = ENTITY_STORE if game.use_entity_store else 0
+        self.file.write(HEADER.pack(START, seed, self.time, flags))
+        return seed
+
+    def stop(self):
+        """Finish the session and hand the game its clock and input back."""
+        self.flush_tick()
+        self.file.write(FOOTER.pack(END, self.ticks, self.game.score))
+        self.file.flush()
+        self.game.clock, self.game.input = self.clock, self.input
+        self.game = None
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def flush_tick(self):
+        if self.bits is not None:
+            # Game.events has put the fractions on the events by now
+            jumps = [(event.type == pg.KEYUP, round(getattr(event, 'fraction', 0.0) * 255))
+                     for event in self.jumps]
+            releases = sum(release for release, at in jumps)
+            if releases > 1 or len(jumps) - releases > 1:
+                jumps = jumps[:255]
+                self.file.write(JUMPS.pack(SEQUENCE, len(jumps)) +
+                                b''.join(JUMP.pack(*jump) for jump in jumps))
+            else:
+                press = next((at for release, at in jumps if not release), 0)
+                release = next((at for release, at in jumps if release), 0)
+                if press or release:
+                    self.file.write(FRACTIONS.pack(SUBTICK, press, release))
+            self.file.write(TICK.pack(self.bits, min(self.delta, 0xFFFF)))
+            self.ticks += 1
+        self.bits = None
+        self.jumps = []
+
+    # Clock
+    def tick(self, fps=None):
+        dt = self.clock.tick(fps)
+        self.flush_tick()
+        # The time this tick starts at goes with this tick's input
+        now = self.clock.get_ticks()
+        self.delta = now - self.time
+        self.time = now
+        self.bits = 0
+        return dt
+
+    def get_ticks(self):
+        return self.clock.get_ticks()
+
+    # Input
+    def poll(self):
+        self.input.poll()
+
+    def get_events(self):
+        events = self.input.get_events()
+        for event in events:
+            if event.type in (pg.KEYDOWN, pg.KEYUP) and event.key == pg.K_UP:
+                if event.type == pg.KEYDOWN:
+                    self.bits |= UP_PRESS
+                else:
+                    if not self.bits & UP_PRESS:
+                        self.bits |= RELEASE_FIRST
+                    self.bits |= UP_RELEASE
+                self.jumps.append(event)
+        return events
+
+    def get_pressed(self):
+        keys = self.input.get_pressed()
+        self.bits &= ~(LEFT | RIGHT | UP_HELD)
+        self.bits |= ((LEFT if keys[pg.K_LEFT] else 0) |
+                      (RIGHT if keys[pg.K_RIGHT] else 0) |
+                      (UP_HELD if keys[pg.K_UP] else 0))
+        return keys
+
+
+class Session:
+    def __init__(self, seed, start, flags):
+        self.seed = seed
+        self.start = start
+        self.flags = flags
+        self.inputs = bytearray()
+        self.deltas = []
+        # Tick index -> (press, release) sub-tick times, when not both 0
+        self.fractions = {}
+        # Tick index -> [(release, at)], for ticks the bits can't describe
+        self.jumps = {}
+        # None if the log ends before the session did
+        self.ticks = None
+        self.score = None
+
+
+def read_sessions(path):
+    """Parse a log, ignoring a truncated record at its end."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sessions = []
+    i = 0
+    while i < len(data):
+        marker = data[i]
+        if marker == START:
+            if i + HEADER.size > len(data):
+                break
+            sessions.append(Session(*HEADER.unpack_from(data, i)[1:]))
+            i += HEADER.size
+        elif marker == END:
+            if i + FOOTER.size > len(data):
+                break
+            _, sessions[-1].ticks, sessions[-1].score = FOOTER.unpack_from(data, i)
+            i += FOOTER.size
+        elif marker == SUBTICK:
+            if i + FRACTIONS.size > len(data):
+                break
+            session = sessions[-1]
+            session.fractions[len(session.inputs)] = FRACTIONS.unpack_from(data, i)[1:]
+            i += FRACTIONS.size
+        elif marker == SEQUENCE:
+            if i + JUMPS.size > len(data):
+                break
+            count = JUMPS.unpack_from(data, i)[1]
+            end = i + JUMPS.size + count * JUMP.size
+            if end > len(data):
+                break
+            session = sessions[-1]
+            session.jumps[len(session.inputs)] = list(JUMP.iter_unpack(data[i + JUMPS.size:end]))
+            i = end
+        else:
+            if i + TICK.size > len(data):
+                break
+            bits, dt = TICK.unpack_from(data, i)
+            sessions[-1].inputs.append(bits)
+            sessions[-1].deltas.append(dt)
+            i += TICK.size
+    return sessions
+
+
+class Replay:
+    """Clock and input source that plays a recorded session back."""
+    def __init__(self, session):
+        self.session = session
+        self.index = -1
+        self.time = session.start
+        self.held = HeldKeys()
+
+    def done(self):
+        return self.index + 1 >= len(self.session.inputs)
+
+    # Clock
+    def tick(self, fps=None):
+        self.index += 1
+        self.time += self.session.deltas[self.index]
+        return self.session.deltas[self.index]
+
+    def get_ticks(self):
+        return self.time
+
+    # Input
+    def get_events(self):
+        jumps = self.session.jumps.get(self.index)
+        if jumps is not None:
+            return [pg.event.Event(pg.KEYUP if release else pg.KEYDOWN, key=pg.K_UP,
+                                   fraction=at / 255) for release, at in jumps]
+        bits = self.session.inputs[self.index]
+        press_at, release_at = self.session.fractions.get(self.index, (0, 0))
+        press = pg.event.Event(pg.KEYDOWN, key=pg.K_UP, fraction=press_at / 255)
+        release = pg.event.Event(pg.KEYUP, key=pg.K_UP, fraction=release_at / 255)
+        events = []
+        if bits & UP_PRESS:
+            events.append(press)
+        if bits & UP_RELEASE:
+            events.insert(0 if bits & RELEASE_FIRST else len(events), release)
+        return events
+
+    def get_pressed(self):
+        bits = self.session.inputs[self.index]
+        held = self.held
+        held.clear()
+        for key, bit in ((pg.K_LEFT, LEFT), (pg.K_RIGHT, RIGHT), (pg.K_UP, UP_HELD)):
+            if bits & bit:
+                held.add(key)
+        return held
+
+
+def replay(game, session):
+    """Re-run a session on a (headless) game, returns its result."""
+    random.seed(session.seed)
+    clock, input = game.clock, game.input
+    game.clock = game.input = player = Replay(session)
+    game.use_entity_store = bool(session.flags & ENTITY_STORE)
+    game.reset()
+    while game.playing and not player.done():
+        game.step()
+    game.clock, game.input = clock, input
+    return {'seed': session.seed, 'score': game.score, 'ticks': game.ticks,
+            'matches': session.score is None or
+                       (game.score, game.ticks) == (session.score, session.ticks)}
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from headless import HeadlessGame
+
+    game = HeadlessGame()
+    for session in read_sessions(sys.argv[1]):
+        start = time.perf_counter()
+        result = replay(game, session)
+        elapsed = time.perf_counter() - start
+        print(f"seed {result['seed']}: score {result['score']} in {result['ticks']} ticks, "
+              f"{result['ticks'] / elapsed:.0f} ticks/s, "
+              f"{'matches' if result['matches'] else 'DIVERGED'}")
@@ -0,0 +1,135 @@
+# High score log.
+# Every finished run is appended to a binary log as a fixed-size record
+# with its own CRC, so a crash mid-write leaves at most one torn record at
+# the end, which is dropped on the next load. Records are written by a
+# background thread; the game only updates the in-memory index.
+import bisect
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+# score, duration in ms, seed (-1 if unknown), unix timestamp, then crc32
+RECORD = struct.Struct('<IIqd')
+CRC = struct.Struct('<I')
+RECORD_SIZE = RECORD.size + CRC.size
+
+
+def rank(record):
+    # Higher scores first, earlier runs first among equal scores
+    return -record[0], record[3]
+
+
+class ScoreBoard:
+    """Run records with top-N and percentile queries.
+
+    With filename=None the board only lives in memory.
+    """
+    def __init__(self, filename, legacy=None):
+        self.filename = filename
+        # Runs best first, and their scores in ascending order
+        self.ranked = []
+        self.scores = []
+        self.queue = None
+        self.writer = None
+        self.load()
+        if not self.ranked and legacy is not None:
+            self.import_legacy(legacy)
+
+    def load(self):
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        good = 0
+        for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            body = data[offset:offset + RECORD.size]
+            crc, = CRC.unpack_from(data, offset + RECORD.size)
+            if zlib.crc32(body) != crc:
+                break
+            self._index(RECORD.unpack(body))
+            good = offset + RECORD_SIZE
+        if good != len(data):
+            # Drop a torn or corrupt tail so new records line up again
+            with open(self.filename, 'r+b') as f:
+                f.truncate(good)
+
+    def import_legacy(self, filename):
+        # The old highscore.txt held a single integer
+        try:
+            with open(filename) as f:
+                score = int(f.read())
+            stamp = os.path.getmtime(filename)
+        except (OSError, ValueError):
+            return
+        if score > 0:
+            self.add(score, 0, None, stamp)
+
+    def _index(self, record):
+        bisect.insort(self.ranked, record, key=rank)
+        bisect.insort(self.scores, record[0])
+
+    def add(self, score, duration, seed=None, stamp=None):
+        """Record a run; returns at once, the write happens in the background."""
+        record = (score, int(duration), -1 if seed is None else seed,
+                  time.time() if stamp is None else stamp)
+        self._index(record)
+        if self.filename is None:
+            return record
+        if self.writer is None:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._write, name='scores', daemon=True)
+            self.writer.start()
+        body = RECORD.pack(*record)
+        self.queue.put(body + CRC.pack(zlib.crc32(body)))
+        return record
+
+    def _write(self):
+        with open(self.filename, 'ab') as f:
+            while True:
+                batch = [self.queue.get()]
+                # Write whatever piled up in one go, then sync once
+                while True:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                data = b''.join(item for item in batch if item is not None)
+                if data:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                for item in batch:
+                    self.queue.task_done()
+                if stop:
+                    return
+
+    def flush(self):
+        """Block until every record added so far is on disk."""
+        if self.queue is not None:
+            self.queue.join()
+
+    def close(self):
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def best(self):
+        return self.scores[-1] if self.scores else 0
+
+    def top(self, n=10):
+        """The n best runs, best first, as (score, duration, seed, timestamp)."""
+        return self.ranked[:n]
+
+    def percentile(self, score):
+        """Percentage of recorded runs that scored less than score."""
+        if not self.scores:
+            return 100.0
+        return 100.0 * bisect.bisect_left(self.scores, score) / len(self.scores)
+
+    def __len__(self):
+        return len(self.ranked)
@@ -4,15 +4,49 @@
 TITLE = "Jumpy!"
 WIDTH = 480
 HEIGHT = 600
-FPS = 60
+FPS = 60             # Simulation ticks per second
+DISPLAY_FPS = 60     # Frame cap when drawing, 0 for none (vsync)
+MAX_FRAME_STEPS = 5  # Ticks run per frame at most, when catching up
+INTERPOLATE = True   # Draw sprites between ticks when frames fall between them
 FONT_NAME = 'arial'
-HS_FILE = 'highscore.txt'
+# The game is drawn at WIDTH x HEIGHT and scaled to the window.
+WINDOW_SIZE = None   # (w, h), None for WIDTH x HEIGHT
+FULLSCREEN = False
+SMOOTH_SCALE = True   # Only when there's no GPU renderer to scale with
+HS_FILE = 'scores.log'
+HS_LEGACY_FILE = 'highscore.txt'
 SPRITESHEET = 'spritesheet_jumper.png'
+SOUNDS = {'jump': 'jump_sound1.wav',
+          'boost': 'Boost1.ogg',
+          'shield_up': 'shieldUp.ogg',
+          'shield_down': 'shieldDown.ogg',
+          'bunny': 'bunny_sound.ogg',
+          'alarm': 'alarm_sound.wav',
+          # Music is decoded up front too, so restarts start instantly
+          'menu_music': 'Yippee.ogg',
+          'game_music': 'Happy Tune.ogg'}
+# Effects share SOUND_CHANNELS mixer channels. When they are all busy a
+# sound replaces one of lower priority. Repeats closer than
+# SOUND_REPEAT_MS are dropped.
+SOUND_CHANNELS = 6
+SOUND_REPEAT_MS = 80
+SOUND_PRIORITY = {'jump': 1,
+                  'boost': 2,
+                  'shield_up': 2,
+                  'shield_down': 2,
+                  'bunny': 2,
+                  'alarm': 3}
 
 # Enviroment properties.
 GRAVITY = 0.5
 BG_COLOR = (51, 153, 255) # or 'lightblue'
 MAX_DISTANCE_BETWEEN_PLATFORMS = 205
+# Vertical gap between platforms (px), sets the platform density.
+PLATFORM_GAP = (50, 170)
+# Share of the jump's sideways reach used when placing platforms.
+REACH_MARGIN = 0.8
+# Platforms are spawned once they are this close above the screen.
+SPAWN_MARGIN = 100
 
 # Game properties.
 BOOST_POWER = 25
@@ -25,6 +59,42 @@ PLATFORM_LAYER = 1
 POW_LAYER = 2
 MOB_LAYER = 3
 CLOUD_LAYER = 0
+# Cloud sizes (percent of the image) pre-scaled at load time.
+CLOUD_SCALES = range(50, 101, 10)
+# Draw the clouds as one wrapping background layer instead of sprites.
+PARALLAX_BACKGROUND = False
+BACKGROUND_CLOUDS = 12
+BACKGROUND_PARALLAX = 3   # World scroll divided by this
+BACKGROUND_DRIFT = 0.5
+# Move platforms, mobs and clouds in NumPy arrays (needs numpy).
+USE_ENTITY_STORE = False
+# Redraw and present only the changed parts of the screen.
+DIRTY_RECTS = False
+# Keep collision groups sorted by height. Only pays off with far more
+# platforms than the game has.
+SPATIAL_INDEX = False
+# Spectator server (JUMPER_SERVE=[host:]port). A spectator whose socket
+# buffers more than SPECTATOR_BUFFER bytes skips frames until it catches up.
+# Delta frames are around 50 bytes, so that is some twenty ticks behind.
+SPECTATOR_PORT = 8765
+SPECTATOR_BUFFER = 1024
+GHOST_ALPHA = 110
+
+# Spritesheet frames (names from spritesheet_jumper.xml).
+PLAYER_STAND_FRAMES = ('bunny1_ready', 'bunny1_stand')
+PLAYER_WALK_FRAMES = ('bunny1_walk1', 'bunny1_walk2')
+PLAYER_JUMP_FRAME = 'bunny1_jump'
+SHIELD_FRAME = 'bubble'
+PLATFORM_FRAMES = ('ground_grass', 'ground_grass_small')
+POW_TYPES = ('boost', 'shield', 'bunny')
+POW_FRAMES = {'boost': 'powerup_jetpack',
+              'shield': 'powerup_empty',
+              'bunny': 'powerup_bunny'}
+MOB_UP_FRAME = 'flyMan_fly'
+MOB_DOWN_FRAME = 'flyMan_jump'
+GAME_FRAMES = (PLAYER_STAND_FRAMES + PLAYER_WALK_FRAMES + PLATFORM_FRAMES
+               + tuple(POW_FRAMES.values())
+               + (PLAYER_JUMP_FRAME, SHIELD_FRAME, MOB_UP_FRAME, MOB_DOWN_FRAME))
 
 # Player properties.
 PLAYER_ACC = 0.5
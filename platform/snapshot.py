@@ -0,0 +1,353 @@
+# Game state snapshots.
+# snapshot(game) packs everything the simulation reads into one flat
+# binary record: the game's counters and timers, the player, every
+# platform, powerup, mob and cloud, the planned platforms, the held keys,
+# the fixed clock and the random states. restore(game, data) puts any
+# game with the same assets back in that state (in another process too),
+# so stepping it plays out exactly like the original from that tick on.
+# fork(game) is a second game sharing the loaded assets, for lookahead:
+#
+#   state = snapshot(game)
+#   for keys in candidates:
+#       restore(branch, state)
+#       branch.input.set_keys(keys)
+#       branch.step()
+#
+# The game draws from the global random module. A fork keeps a random
+# state of its own and swaps it in while it steps or resets, so running a
+# branch never moves the stream of the game it was forked from.
+import copy
+import math
+import random
+import struct
+from collections import deque
+
+import pygame as pg
+
+from settings import *
+from engine import FixedClock, RealClock, ScriptedInput
+from pool import SpritePool
+from profiler import FrameProfiler
+from render import DirtyRenderer
+from scores import ScoreBoard
+from audio import SoundManager
+
+VERSION = 2
+# version, flags, death, ticks, start time, score, scroll, camera,
+# mob timer, clock, background x and y, then the powerups taken by type
+GAME = struct.Struct(f'<BBBIiIdiiddd{len(POW_TYPES)}I')
+# pos, vel, acc, rect, frame, animation frame, flags, last frame change,
+# shield and bunny start, shield icon position
+PLAYER = struct.Struct('<6d4iHBBiii2i')
+# Mersenne Twister words and position, then the cached gauss (nan if none)
+RNG = struct.Struct('<625Id')
+# held keys, queued key events, planned platforms, then the sprite counts
+COUNTS = struct.Struct('<BBH4H')
+KEY = struct.Struct('<I')
+EVENT = struct.Struct('<?I')
+# index of the top platform (-1 if gone), the span it covers
+PLATGEN = struct.Struct('<iii')
+PLAN = struct.Struct('<BiH')
+PLATFORM = struct.Struct('<iiB')
+POW = struct.Struct('<HBii')
+# rect x and y, facing up, visible, then x, y, vx, vy and dy
+MOB = struct.Struct('<ii??5d')
+# rect x and y, variant, scale, parallax, visible, then x, vx and the
+# store's x and y
+CLOUD = struct.Struct('<iiBBB?4d')
+
+# Game flags
+STORE, PLAYING, BACKGROUND = 1, 2, 4
+# Player flags
+JUMPING, WALKING, SHIELD, BUNNY, BOOST_SOUND = (1 << i for i in range(5))
+DEATHS = (None, 'mob', 'fall')
+
+
+# Fork methods that draw from the random module
+OWN_RANDOM = ('step', 'reset')
+
+
+def pack_rng(state):
+    version, words, gauss = state
+    return RNG.pack(*words, math.nan if gauss is None else gauss)
+
+
+def unpack_rng(data, offset):
+    *words, gauss = RNG.unpack_from(data, offset)
+    return (3, tuple(words), None if math.isnan(gauss) else gauss)
+
+
+def player_frames(player):
+    return (player.standing_frames + player.walk_frames_r +
+            player.walk_frames_l + [player.jump_frame])
+
+
+def cloud_images(game):
+    # Cloud surface -> (variant, scale) index
+    return {image: (i, j) for i, variants in enumerate(game.cloud_variants)
+            for j, image in enumerate(variants)}
+
+
+def own_random(game, method):
+    # method with the fork's random state swapped in for the call
+    def call(*args, **kwargs):
+        outer = random.getstate()
+        random.setstate(game.random_state)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            game.random_state = random.getstate()
+            random.setstate(outer)
+    return call
+
+
+def revive(pool, groups, *args):
+    # A pooled sprite back in its groups as it was, the caller sets its
+    # state. Skips reset() and its random draws unless one must be built.
+    if not pool.free:
+        return pool.spawn(*args)
+    sprite = pool.free.pop()
+    pool.reused += 1
+    sprite.add(groups)
+    return sprite
+
+
+def track(store, sprite):
+    # The store slot of a sprite, with its current size and layer
+    if sprite.slot is None:
+        store.add(sprite, sprite._layer)
+    store.set_size(sprite)
+    return sprite.slot
+
+
+def snapshot(game):
+    """The state of a game between two ticks, as bytes."""
+    store = game.entities
+    background = game.background
+    flags = ((STORE if store is not None else 0) | (PLAYING if game.playing else 0) |
+             (BACKGROUND if background is not None else 0))
+    clock = game.clock.time if isinstance(game.clock, FixedClock) else 0.0
+    parts = [GAME.pack(VERSION, flags, DEATHS.index(game.death), game.ticks,
+                       game.start_time, game.score, game.scroll, game.camera,
+                       game.mob_timer, clock,
+                       background.x if background is not None else 0.0,
+                       background.y if background is not None else 0.0,
+                       *(game.pows_taken[kind] for kind in POW_TYPES))]
+
+    p = game.player
+    pflags = ((JUMPING if p.jumping else 0) | (WALKING if p.walking else 0) |
+              (SHIELD if p.is_shield else 0) | (BUNNY if p.jump_boost else 0) |
+              (BOOST_SOUND if p.boost_sound else 0))
+    parts.append(PLAYER.pack(*p.pos, *p.vel, *p.acc, *p.rect,
+                             player_frames(p).index(p.image), p.current_frame, pflags,
+                             p.last_update, p.shield_time, p.jump_boost_time,
+                             *p.shield_rect.topleft))
+    parts.append(pack_rng(getattr(game, 'random_state', None) or random.getstate()))
+    parts.append(pack_rng(game.scenery.getstate()))
+    parts.append(pack_rng(game.platgen.rng.getstate()))
+
+    held = events = ()
+    if isinstance(game.input, ScriptedInput):
+        held, events = game.input.held, game.input.events
+    platforms = list(game.platforms)
+    clouds = list(game.clouds)
+    platgen = game.platgen
+    parts.append(COUNTS.pack(len(held), len(events), len(platgen.queue), len(platforms),
+                             len(game.powerups), len(game.mobs), len(clouds)))
+    parts.extend(KEY.pack(key) for key in held)
+    parts.extend(EVENT.pack(event.type == pg.KEYUP, event.key) for event in events)
+
+    index = {plat: i for i, plat in enumerate(platforms)}
+    parts.append(PLATGEN.pack(index.get(platgen.top, -1), platgen.left, platgen.right))
+    parts.extend(PLAN.pack(PLATFORM_FRAMES.index(frame), left, gap)
+                 for frame, left, gap in platgen.queue)
+    frames = {game.spritesheet.get_frame(name): i for i, name in enumerate(PLATFORM_FRAMES)}
+    parts.extend(PLATFORM.pack(plat.rect.x, plat.rect.y, frames[plat.image])
+                 for plat in platforms)
+    parts.extend(POW.pack(index[pow.plat], POW_TYPES.index(pow.type), pow.rect.x, pow.rect.y)
+                 for pow in game.powerups)
+
+    # The store owns the exact positions of what it tracks
+    for mob in game.mobs:
+        x, y = mob.rect.topleft
+        visible = True
+        if mob.slot is not None:
+            x, y, visible = store.x[mob.slot], store.y[mob.slot], store.visible[mob.slot]
+            vx, vy, dy = store.vx[mob.slot], store.vy[mob.slot], store.dy[mob.slot]
+        else:
+            vx, vy, dy = mob.vx, mob.vy, mob.dy
+        parts.append(MOB.pack(mob.rect.x, mob.rect.y, mob.image is mob.image_up,
+                              visible, x, y, vx, vy, dy))
+    images = cloud_images(game) if clouds else None
+    for cloud in clouds:
+        x, y, visible = 0.0, 0.0, True
+        if cloud.slot is not None:
+            x, y, visible = store.x[cloud.slot], store.y[cloud.slot], store.visible[cloud.slot]
+        parts.append(CLOUD.pack(cloud.rect.x, cloud.rect.y, *images[cloud.image],
+                                cloud.parallax, visible, cloud.x, cloud.vx, x, y))
+    return b''.join(parts)
+
+
+def restore(game, data):
+    """Put game in the state recorded by snapshot(), random states included."""
+    # Building sprites may draw from the random module
+    outer = random.getstate()
+    version, flags, death, game.ticks, game.start_time, game.score, game.scroll, \
+        game.camera, game.mob_timer, clock, bx, by, *taken = GAME.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f'snapshot version {version}, expected {VERSION}')
+    offset = GAME.size
+    game.finish_loading()
+    game.playing = bool(flags & PLAYING)
+    game.death = DEATHS[death]
+    game.pows_taken = dict(zip(POW_TYPES, taken))
+    game.view = game.last_camera = game.camera
+    game.last_positions = []
+    if isinstance(game.clock, FixedClock):
+        game.clock.time = clock
+    if game.background is not None and flags & BACKGROUND:
+        game.background.x, game.background.y = bx, by
+    if not hasattr(game, 'scenery'):
+        game.scenery = random.Random()
+    game.use_entity_store = bool(flags & STORE)
+    game.new_world()
+    store = game.entities
+
+    p = game.player
+    (p.pos.x, p.pos.y, p.vel.x, p.vel.y, p.acc.x, p.acc.y, x, y, w, h, frame,
+     p.current_frame, pflags, p.last_update, p.shield_time, p.jump_boost_time,
+     sx, sy) = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    p.image = player_frames(p)[frame]
+    p.mask = game.spritesheet.get_mask(p.image)
+    p.rect = pg.Rect(x, y, w, h)
+    p.shield_rect.topleft = sx, sy
+    p.jumping, p.walking = bool(pflags & JUMPING), bool(pflags & WALKING)
+    p.is_shield, p.jump_boost = bool(pflags & SHIELD), bool(pflags & BUNNY)
+    p.boost_sound = bool(pflags & BOOST_SOUND)
+    # Applied last, spawning below draws from them
+    rng = unpack_rng(data, offset)
+    scenery = unpack_rng(data, offset + RNG.size)
+    plan = unpack_rng(data, offset + 2 * RNG.size)
+    offset += 3 * RNG.size
+
+    held, events, planned, platforms, pows, mobs, clouds = COUNTS.unpack_from(data, offset)
+    offset += COUNTS.size
+    if isinstance(game.input, ScriptedInput):
+        game.input.reset()
+        for i in range(held):
+            game.input.held.add(KEY.unpack_from(data, offset + i * KEY.size)[0])
+        for i in range(events):
+            up, key = EVENT.unpack_from(data, offset + held * KEY.size + i * EVENT.size)
+            game.input.events.append(pg.event.Event(pg.KEYUP if up else pg.KEYDOWN, key=key))
+    offset += held * KEY.size + events * EVENT.size
+
+    top, left, right = PLATGEN.unpack_from(data, offset)
+    offset += PLATGEN.size
+    platgen = game.platgen
+    platgen.left, platgen.right = left, right
+    platgen.queue = deque((PLATFORM_FRAMES[frame], left, gap) for frame, left, gap
+                          in PLAN.iter_unpack(data[offset:offset + planned * PLAN.size]))
+    offset += planned * PLAN.size
+
+    spawned = []
+    pool = game.pools['platform']
+    groups = game.all_sprites, game.platforms
+    for x, y, frame in PLATFORM.iter_unpack(data[offset:offset + platforms * PLATFORM.size]):
+        plat = revive(pool, groups, x, y)
+        if plat.pow is not None:
+            plat.pow.kill()
+        plat.image = game.spritesheet.get_frame(PLATFORM_FRAMES[frame])
+        plat.rect = plat.image.get_rect(topleft=(x, y))
+        spawned.append(plat)
+    offset += platforms * PLATFORM.size
+    # A dead sprite stops spawn() like the killed top platform did
+    platgen.top = spawned[top] if top >= 0 else pg.sprite.Sprite()
+
+    pool = game.pools['pow']
+    groups = game.all_sprites, game.powerups
+    for plat, kind, x, y in POW.iter_unpack(data[offset:offset + pows * POW.size]):
+        plat = spawned[plat]
+        pow = plat.pow = revive(pool, groups, plat)
+        pow.plat = plat
+        pow.type = POW_TYPES[kind]
+        pow.image = game.spritesheet.get_frame(POW_FRAMES[pow.type])
+        pow.rect = pow.image.get_rect(topleft=(x, y))
+    offset += pows * POW.size
+
+    pool = game.pools['mob']
+    groups = game.all_sprites, game.mobs
+    for rx, ry, up, visible, x, y, vx, vy, dy in MOB.iter_unpack(
+            data[offset:offset + mobs * MOB.size]):
+        mob = revive(pool, groups)
+        mob.image = mob.image_up if up else mob.image_down
+        mob.mask = game.spritesheet.get_mask(mob.image)
+        mob.rect = mob.image.get_rect(topleft=(rx, ry))
+        mob.vx, mob.vy, mob.dy = vx, vy, dy
+        if store is not None:
+            i = track(store, mob)
+            store.x[i], store.y[i], store.visible[i] = x, y, visible
+            store.vx[i], store.vy[i], store.dy[i] = vx, vy, dy
+            store.up[i] = up
+    offset += mobs * MOB.size
+
+    pool = game.pools['cloud']
+    groups = game.all_sprites, game.clouds
+    for rx, ry, variant, scale, parallax, visible, x, vx, sx, sy in CLOUD.iter_unpack(
+            data[offset:offset + clouds * CLOUD.size]):
+        cloud = revive(pool, groups)
+        cloud.image = game.cloud_variants[variant][scale]
+        cloud.rect = cloud.image.get_rect(topleft=(rx, ry))
+        cloud.x, cloud.vx, cloud.parallax = x, vx, parallax
+        if store is not None:
+            i = track(store, cloud)
+            store.x[i], store.y[i], store.visible[i] = sx, sy, visible
+            store.vx[i], store.parallax[i] = vx, parallax
+
+    if hasattr(game, 'random_state'):
+        game.random_state = rng
+        random.setstate(outer)
+    else:
+        random.setstate(rng)
+    game.scenery.setstate(scenery)
+    platgen.rng.setstate(plan)
+
+
+def fork(game):
+    """A silent headless copy of game sharing its assets, in the same state.
+
+    The copy has its own clock, scripted input, sprite pools, platform
+    plan, random state and per-run bookkeeping. It draws to the same
+    screen as game.
+    """
+    clone = copy.copy(game)
+    # A fork of a fork gets its own wrappers below
+    for name in OWN_RANDOM:
+        clone.__dict__.pop(name, None)
+    # new_world() would kill the original's sprites
+    del clone.all_sprites
+    clone.clock = copy.copy(game.clock) if isinstance(game.clock, FixedClock) else FixedClock()
+    clone.frame_clock = RealClock()
+    clone.tick_window = None
+    clone.input_stamps = []
+    clone.music_pending = None
+    clone.input = ScriptedInput()
+    clone.recorder = None
+    clone.server = None
+    clone.profiler = FrameProfiler(enabled=False)
+    clone.scores = ScoreBoard(None)
+    clone.sounds = SoundManager(clone)
+    clone.pools = {name: SpritePool(clone, pool.cls, pool.max_free)
+                   for name, pool in game.pools.items()}
+    clone.platgen = copy.copy(game.platgen)
+    clone.platgen.game = clone
+    clone.platgen.rng = random.Random()
+    clone.background = copy.copy(game.background)
+    clone.renderer = DirtyRenderer(clone) if game.renderer is not None else None
+    clone.scenery = random.Random()
+    # Carries on from where game's stream is, restore() keeps it
+    clone.random_state = getattr(game, 'random_state', None) or random.getstate()
+    restore(clone, snapshot(game))
+    for name in OWN_RANDOM:
+        setattr(clone, name, own_random(clone, getattr(clone, name)))
+    return clone
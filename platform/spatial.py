@@ -0,0 +1,120 @@
+# Broad-phase collision index.
+# IndexedGroup keeps its sprites sorted by rect.top, so a collision query
+# only tests the sprites in the vertical band around the querying rect,
+# and culling above or below a line only touches the culled sprites.
+# Platforms and powerups never move in world coordinates, which keeps the
+# order intact; groups whose sprites move on their own are re-sorted
+# (an almost sorted list, so it is cheap) before each query.
+#
+# Keeping the order costs more than it saves at the game's density of a
+# handful of platforms (see bench/bench_collision.py), so the game uses
+# SpriteGroup, the same queries by linear scan, unless SPATIAL_INDEX is set.
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+from operator import attrgetter
+
+import pygame as pg
+
+top = attrgetter('rect.top')
+height = attrgetter('rect.height')
+
+
+class SpriteGroup(pg.sprite.Group):
+    """Plain group with the query methods of IndexedGroup."""
+    def __init__(self, *sprites, moving=False):
+        super().__init__(*sprites)
+
+
+    def below(self, y):
+        """Sprites whose top is at or below y."""
+        return [sprite for sprite in self if sprite.rect.top >= y]
+
+
+    def above(self, y):
+        """Sprites whose bottom is above y."""
+        return [sprite for sprite in self if sprite.rect.bottom < y]
+
+
+    def spritecollide(self, sprite, dokill=False, collided=None):
+        return pg.sprite.spritecollide(sprite, self, dokill, collided)
+
+
+class IndexedGroup(pg.sprite.Group):
+    def __init__(self, *sprites, moving=False):
+        self.moving = moving
+        # Group iteration order, so results match pg.sprite.spritecollide
+        self.order = {}
+        self.counter = count()
+        self.sorted = []
+        # Sprites join the group before their rect is placed
+        self.pending = []
+        self.max_height = 0
+        super().__init__(*sprites)
+
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = next(self.counter)
+        self.pending.append(sprite)
+
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.order[sprite]
+        if sprite in self.pending:
+            self.pending.remove(sprite)
+            return
+        if not self.moving:
+            i = bisect_left(self.sorted, sprite.rect.top, key=top)
+            while i < len(self.sorted) and self.sorted[i].rect.top == sprite.rect.top:
+                if self.sorted[i] is sprite:
+                    del self.sorted[i]
+                    return
+                i += 1
+        self.sorted.remove(sprite)
+
+
+    def flush(self):
+        for sprite in self.pending:
+            insort(self.sorted, sprite, key=top)
+            self.max_height = max(self.max_height, sprite.rect.height)
+        self.pending.clear()
+        if self.moving:
+            self.sorted.sort(key=top)
+            self.max_height = max(map(height, self.sorted), default=0)
+
+
+    def candidates(self, rect):
+        """Sprites whose vertical extent overlaps rect."""
+        self.flush()
+        lo = bisect_right(self.sorted, rect.top - self.max_height, key=top)
+        hi = bisect_left(self.sorted, rect.bottom, lo, key=top)
+        return self.sorted[lo:hi]
+
+
+    def below(self, y):
+        """Sprites whose top is at or below y."""
+        self.flush()
+        return self.sorted[bisect_left(self.sorted, y, key=top):]
+
+
+    def above(self, y):
+        """Sprites whose bottom is above y."""
+        self.flush()
+        hi = bisect_left(self.sorted, y, key=top)
+        return [sprite for sprite in self.sorted[:hi] if sprite.rect.bottom < y]
+
+
+    def spritecollide(self, sprite, dokill=False, collided=None):
+        """Same hits, in the same order, as pg.sprite.spritecollide."""
+        if collided is None:
+            collide = sprite.rect.colliderect
+            hits = [s for s in self.candidates(sprite.rect) if collide(s.rect)]
+        else:
+            hits = [s for s in self.candidates(sprite.rect) if collided(sprite, s)]
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        if dokill:
+            for hit in hits:
+                hit.kill()
+        return hits
@@ -0,0 +1,455 @@
+# Spectator and ghost server.
+# With JUMPER_SERVE=[host:]port the game streams every tick to any number
+# of local spectators, over plain TCP or WebSocket, and draws the players
+# that ghost clients stream back to it as translucent bunnies.
+#
+# The server runs an asyncio loop in its own thread. The game hands it a
+# small picture of each tick (player, platforms, mobs, powerups, score)
+# and never waits on a socket. Each spectator gets the changes since the
+# last frame it was sent, so a slow one whose socket buffer is full simply
+# skips ticks and then receives one larger delta, while the rest stream on.
+#
+# Wire format: TCP clients send MAGIC and then length-prefixed messages
+# both ways; WebSocket clients do the usual handshake and use one binary
+# message each. Server to client, a frame is a FRAME header followed by
+# upserted ENTITY records and removed entity ids. A key frame (no base)
+# replaces the client's whole world. Client to server, a GHOST message
+# places that client's ghost.
+#
+#   python spectator.py serve                 headless bot game to watch
+#   python spectator.py watch --clients 300   load test spectators
+#   python spectator.py watch --ghost 2       also stream ghost players
+import asyncio
+import base64
+import hashlib
+import itertools
+import re
+import socket
+import struct
+import threading
+import weakref
+
+from settings import *
+
+MAGIC = b'JMP1'
+LENGTH = struct.Struct('<I')
+# kind, tick, base tick, score, camera, player x and y, player frame and
+# flags, upserts, removals
+FRAME = struct.Struct('<BIIIiiiBBHH')
+# id, kind, x, y, frame
+ENTITY = struct.Struct('<IBhiB')
+REMOVED = struct.Struct('<I')
+# kind, x, y, frame
+GHOST = struct.Struct('<BhiB')
+# Longest message a client may send; a ghost is all there is
+MAX_MESSAGE = 64
+KEY_FRAME, DELTA_FRAME, GHOST_MESSAGE = range(3)
+PLATFORM, MOB, POW = range(3)
+# Player flags
+SHIELD, BUNNY = 1, 2
+# Frame ids on the wire
+FRAMES = ([(name, False) for name in GAME_FRAMES] +
+          [(name, True) for name in PLAYER_WALK_FRAMES])
+# The ones a ghost may be drawn with
+PLAYER_FRAME_IDS = frozenset(i for i, (name, flip) in enumerate(FRAMES) if name in
+                             PLAYER_STAND_FRAMES + PLAYER_WALK_FRAMES + (PLAYER_JUMP_FRAME,))
+# Highest world y a ghost is placed at, far above any real game
+GHOST_TOP = -(1 << 30)
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class WorldState:
+    """What spectators see of one tick: a header and entity id -> record."""
+    def __init__(self, tick, header, entities):
+        self.tick = tick
+        self.header = header
+        self.entities = entities
+
+
+def encode(state, base=None):
+    """A frame taking a client from base (None for nothing) to state."""
+    entities = state.entities
+    if base is None:
+        upserts = entities.items()
+        removed = ()
+    else:
+        old = base.entities
+        upserts = [(eid, entity) for eid, entity in entities.items() if old.get(eid) != entity]
+        removed = [eid for eid in old if eid not in entities]
+    parts = [FRAME.pack(KEY_FRAME if base is None else DELTA_FRAME, state.tick,
+                        0 if base is None else base.tick, *state.header,
+                        len(upserts), len(removed))]
+    parts.extend(ENTITY.pack(eid, *entity) for eid, entity in upserts)
+    parts.extend(REMOVED.pack(eid) for eid in removed)
+    return b''.join(parts)
+
+
+class Spectator:
+    """Client side world, kept up to date by applying frames."""
+    def __init__(self):
+        self.tick = None
+        self.score = 0
+        self.camera = 0
+        self.player = None
+        self.entities = {}
+
+    def apply(self, data):
+        kind, tick, base, self.score, self.camera, x, y, frame, flags, upserts, removed = \
+            FRAME.unpack_from(data)
+        if kind == DELTA_FRAME and base != self.tick:
+            raise ValueError(f'delta from tick {base}, the world is at {self.tick}')
+        if kind == KEY_FRAME:
+            self.entities.clear()
+        self.tick = tick
+        self.player = (x, y, frame, flags)
+        offset = FRAME.size
+        for i in range(upserts):
+            eid, *entity = ENTITY.unpack_from(data, offset)
+            self.entities[eid] = tuple(entity)
+            offset += ENTITY.size
+        for i in range(removed):
+            del self.entities[REMOVED.unpack_from(data, offset)[0]]
+            offset += REMOVED.size
+        return kind
+
+
+def ws_frame(payload):
+    # Unmasked binary message, as sent by a server
+    n = len(payload)
+    if n < 126:
+        head = struct.pack('!BB', 0x82, n)
+    elif n < 1 << 16:
+        head = struct.pack('!BBH', 0x82, 126, n)
+    else:
+        head = struct.pack('!BBQ', 0x82, 127, n)
+    return head + payload
+
+
+async def read_ws(reader):
+    """Next data message from a WebSocket client, None once it closes or
+    sends more than MAX_MESSAGE bytes."""
+    while True:
+        first, second = await reader.readexactly(2)
+        n = second & 0x7F
+        if n == 126:
+            n, = struct.unpack('!H', await reader.readexactly(2))
+        elif n == 127:
+            n, = struct.unpack('!Q', await reader.readexactly(8))
+        if n > MAX_MESSAGE:
+            return None
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(n)
+        if mask is not None:
+            payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+        opcode = first & 0x0F
+        if opcode == 8:
+            return None
+        if opcode in (1, 2):
+            return payload
+
+
+class Client:
+    def __init__(self, writer, websocket):
+        self.writer = writer
+        self.websocket = websocket
+        # Last state sent, the next frame is a delta from it
+        self.base = None
+        self.frames = 0
+        self.skipped = 0
+
+    def send(self, data):
+        if self.websocket:
+            self.writer.write(ws_frame(data))
+        else:
+            self.writer.write(LENGTH.pack(len(data)) + data)
+
+
+class SpectatorServer:
+    """Streams a game to spectators and collects ghosts, on its own thread."""
+    def __init__(self, host='127.0.0.1', port=None, buffer=None):
+        self.host = host
+        self.port = SPECTATOR_PORT if port is None else port
+        self.buffer = SPECTATOR_BUFFER if buffer is None else buffer
+        self.clients = set()
+        # Every open connection, including ones still handshaking
+        self.writers = set()
+        # (x, y, frame) of every ghost, replaced whole so the game thread
+        # can read it without a lock
+        self.ghosts = ()
+        self.ghost_of = {}
+        self.loop = None
+        self.thread = None
+        self.error = None
+        self.ids = weakref.WeakKeyDictionary()
+        self.next_id = itertools.count(1)
+        self.frame_ids = None
+        self.ghost_images = {}
+
+    def start(self):
+        """Listen in a background thread; returns once the port is open."""
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,),
+                                       name='spectators', daemon=True)
+        self.thread.start()
+        ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        try:
+            server = self.loop.run_until_complete(
+                asyncio.start_server(self._serve, self.host, self.port))
+        except OSError as error:
+            self.error = error
+            self.thread = None
+            ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            server.close()
+            # Hang up without flushing, the handlers then see the end of stream
+            for writer in list(self.writers):
+                writer.transport.abort()
+            tasks = asyncio.all_tasks(self.loop)
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks))
+            self.loop.run_until_complete(server.wait_closed())
+            self.loop.close()
+
+    def close(self):
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+
+    # Game thread
+    def publish(self, game):
+        """Queue this tick for the spectators, free when nobody watches."""
+        if not self.clients:
+            return
+        if self.frame_ids is None:
+            sheet = game.spritesheet
+            self.frame_ids = {sheet.get_frame(name, flip): i
+                              for i, (name, flip) in enumerate(FRAMES)}
+        frame_ids = self.frame_ids
+        ids = self.ids
+        entities = {}
+        for kind, group in ((PLATFORM, game.platforms), (MOB, game.mobs), (POW, game.powerups)):
+            for sprite in group:
+                eid = ids.get(sprite)
+                if eid is None:
+                    eid = ids[sprite] = next(self.next_id)
+                rect = sprite.rect
+                entities[eid] = (kind, rect.x, rect.y, frame_ids[sprite.image])
+        player = game.player
+        flags = (SHIELD if player.is_shield else 0) | (BUNNY if player.jump_boost else 0)
+        header = (game.score, game.camera, player.rect.x, player.rect.y,
+                  frame_ids[player.image], flags)
+        self.loop.call_soon_threadsafe(self._broadcast, WorldState(game.ticks, header, entities))
+
+    def ghost_image(self, game, frame):
+        """The translucent copy of a player frame a ghost is drawn with."""
+        image = self.ghost_images.get(frame)
+        if image is None:
+            image = game.spritesheet.get_frame(*FRAMES[frame]).copy()
+            image.set_alpha(GHOST_ALPHA)
+            self.ghost_images[frame] = image
+        return image
+
+    # Server thread
+    def _broadcast(self, state):
+        # Clients on the same base share one encoded frame
+        encoded = {}
+        for client in self.clients:
+            transport = client.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > self.buffer:
+                client.skipped += 1
+                continue
+            key = id(client.base)
+            data = encoded.get(key)
+            if data is None:
+                data = encoded[key] = encode(state, client.base)
+            client.send(data)
+            client.base = state
+            client.frames += 1
+
+    async def _serve(self, reader, writer):
+        # A small kernel buffer, so a stalled client shows up as a full
+        # transport buffer instead of seconds of queued frames
+        writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                                   self.buffer)
+        self.writers.add(writer)
+        try:
+            start = await reader.readexactly(4)
+            if start == b'GET ':
+                request = await reader.readuntil(b'\r\n\r\n')
+                key = re.search(rb'Sec-WebSocket-Key:\s*(\S+)', request, re.I)
+                if key is None:
+                    return
+                accept = base64.b64encode(hashlib.sha1(key.group(1) + WS_GUID).digest())
+                writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                             b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+            elif start != MAGIC:
+                return
+            client = Client(writer, start == b'GET ')
+            self.clients.add(client)
+            try:
+                while True:
+                    if client.websocket:
+                        message = await read_ws(reader)
+                    else:
+                        n, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                        # Never wait for more than a client could mean to send
+                        message = await reader.readexactly(n) if n <= MAX_MESSAGE else None
+                    if message is None:
+                        break
+                    if len(message) == GHOST.size and message[0] == GHOST_MESSAGE:
+                        # The game thread draws these as they are, so
+                        # anything off the playfield or not a player
+                        # frame is dropped here
+                        x, y, frame = GHOST.unpack(message)[1:]
+                        if frame not in PLAYER_FRAME_IDS:
+                            continue
+                        x = min(max(x, 0), WIDTH)
+                        y = min(max(y, GHOST_TOP), HEIGHT)
+                        self.ghost_of[client] = x, y, frame
+                        self.ghosts = tuple(self.ghost_of.values())
+            finally:
+                self.clients.discard(client)
+                if self.ghost_of.pop(client, None) is not None:
+                    self.ghosts = tuple(self.ghost_of.values())
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+def parse_address(text):
+    """'host:port' or 'port' -> (host, port)."""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port) if port else SPECTATOR_PORT
+
+
+# Load testing
+async def read_frame(reader):
+    n, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return await reader.readexactly(n)
+
+
+async def watch(host, port, seconds, stats, slow=False):
+    """One spectator: follow the stream for a while, checking every frame."""
+    # Small buffers on this end too, or a slow spectator's kernel and
+    # stream reader would hold a minute of frames before the server saw
+    # it fall behind
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (host, port))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=1024)
+    writer.write(MAGIC)
+    world = Spectator()
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    try:
+        while loop.time() < end:
+            data = await asyncio.wait_for(read_frame(reader), max(0.01, end - loop.time()))
+            if world.tick is not None and data[0] == DELTA_FRAME:
+                # Ticks start over with every new game
+                stats['skipped'] += max(0, FRAME.unpack_from(data)[1] - world.tick - 1)
+            if world.apply(data) == KEY_FRAME:
+                stats['key frames'] += 1
+            stats['frames'] += 1
+            stats['bytes'] += len(data)
+            if slow:
+                await asyncio.sleep(0.1)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+
+
+async def ghost(host, port, seconds, index):
+    """A client streaming a ghost that circles the bottom of the screen."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(MAGIC)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    frame = FRAMES.index((PLAYER_JUMP_FRAME, False))
+    while loop.time() - start < seconds:
+        t = loop.time() - start
+        x = int((t * 120 + index * 90) % WIDTH)
+        message = GHOST.pack(GHOST_MESSAGE, x, HEIGHT - 150 - index * 40, frame)
+        writer.write(LENGTH.pack(len(message)) + message)
+        await writer.drain()
+        await asyncio.sleep(1 / FPS)
+    writer.close()
+
+
+async def load_test(host, port, clients, seconds, slow, ghosts):
+    stats = dict.fromkeys(('frames', 'bytes', 'key frames', 'skipped'), 0)
+    slow_stats = dict(stats)
+    tasks = [watch(host, port, seconds, slow_stats if i < slow else stats, i < slow)
+             for i in range(clients)]
+    tasks += [ghost(host, port, seconds, i) for i in range(ghosts)]
+    await asyncio.gather(*tasks)
+    return stats, slow_stats
+
+
+def serve(address):
+    """Run a bot playing headless in real time, for spectators to watch."""
+    import random
+    import time
+
+    from headless import HeadlessGame
+    from bots import make_policy
+
+    game = HeadlessGame()
+    game.server = SpectatorServer(*address).start()
+    print(f'serving on {game.server.host}:{game.server.port}')
+    bot = make_policy('climber')
+    seed = 0
+    while True:
+        random.seed(seed)
+        bot.reset(seed)
+        game.reset()
+        next_tick = time.perf_counter()
+        while game.playing:
+            bot(game, game.input)
+            game.step()
+            next_tick += 1 / FPS
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+        seed += 1
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Spectator server tools.')
+    parser.add_argument('mode', choices=('serve', 'watch'))
+    parser.add_argument('--address', type=parse_address, default=('127.0.0.1', SPECTATOR_PORT),
+                        metavar='[HOST:]PORT')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--slow', type=int, default=0, help='how many clients read slowly')
+    parser.add_argument('--ghost', type=int, default=0, help='ghost clients to run')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+    if args.mode == 'serve':
+        serve(args.address)
+    else:
+        stats, slow = asyncio.run(load_test(*args.address, args.clients, args.seconds,
+                                            args.slow, args.ghost))
+        for name, s, count in (('spectators', stats, args.clients - args.slow),
+                               ('slow spectators', slow, args.slow)):
+            if count:
+                print(f"{count} {name}: {s['frames'] / count / args.seconds:.1f} frames/s each, "
+                      f"{s['bytes'] / max(1, s['frames']):.0f} bytes/frame, "
+                      f"{s['skipped'] / count:.0f} ticks skipped each, "
+                      f"{s['key frames']} key frames")
@@ -1,16 +1,35 @@
 # Sprite classes for platform game
 import pygame as pg
-from pygame.sprite import Sprite
+from pygame.sprite import DirtySprite
 vec = pg.math.Vector2
-from random import choice, randrange, uniform
+from random import choice, randrange
+from os import path
+import xml.etree.ElementTree as ET
 
 from settings import *
+from background import cloud_variant
 
 
 class Spritesheet:
-    #Utility class for loading and parsing spritesheets
-    def __init__(self, filename):
-        self.spritesheet = pg.image.load(filename).convert()
+    #Utility class for loading and parsing spritesheets.
+    #Named frames are sliced, scaled and converted once, then shared.
+    def __init__(self, filename, image=None):
+        if image is None:
+            image = pg.image.load(filename)
+        self.spritesheet = image.convert()
+        self.regions = self.load_regions(path.splitext(filename)[0] + '.xml')
+        self.frames = {}
+        self.masks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load_regions(self, filename):
+        # Frame name (without extension) -> (x, y, width, height)
+        regions = {}
+        for sub in ET.parse(filename).getroot().iter('SubTexture'):
+            name = path.splitext(sub.get('name'))[0]
+            regions[name] = tuple(int(sub.get(k)) for k in ('x', 'y', 'width', 'height'))
+        return regions
 
     def get_image(self, x, y, width, height):
         #Grab an image out of a larger spritesheet
@@ -19,11 +38,79 @@ class Spritesheet:
         image = pg.transform.scale(image, (width // 3, height // 3))
         return image
 
-class Player(Sprite):
+    def get_frame(self, name, flip=False):
+        """Return the shared surface for a named frame, building it on first use."""
+        key = (name, flip)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        self.misses += 1
+        if flip:
+            frame = pg.transform.flip(self.get_frame(name), True, False)
+        else:
+            frame = self.get_image(*self.regions[name]).convert()
+        # Run-length encoded on first blit, transparent runs are skipped
+        frame.set_colorkey('black', pg.RLEACCEL)
+        self.frames[key] = frame
+        # Mask for pixel perfect collision, built once per frame
+        self.masks[frame] = pg.mask.from_surface(frame)
+        return frame
+
+    def get_mask(self, frame):
+        """Return the precomputed collision mask of a frame from this atlas."""
+        return self.masks[frame]
+
+    def preload(self, names):
+        for name in names:
+            self.get_frame(name)
+
+    def size_bytes(self):
+        return sum(f.get_width() * f.get_height() * f.get_bytesize()
+                   for f in self.frames.values())
+
+    def stats(self):
+        return {'frames': len(self.frames), 'hits': self.hits,
+                'misses': self.misses, 'bytes': self.size_bytes()}
+
+class WorldSprite(DirtySprite):
+    # Sprite placed in world coordinates, the camera scrolls past it. When
+    # the game has an entity store, the store moves it and owns its
+    # position (see entities.py). Sprites handed out by a SpritePool go
+    # back to it when killed, and are re-armed with reset() instead of
+    # being built again.
+    slot = None
+    pool = None
+    # Scrolls 1/parallax as fast as the world, for the far away clouds
+    parallax = 1
+
+    def __init__(self, game, *args):
+        super().__init__()
+        self.game = game
+        self.reset(*args)
+
+    def track(self, **kwargs):
+        if self.game.entities is not None:
+            self.game.entities.add(self, self._layer, **kwargs)
+
+    def kill(self):
+        alive = self.alive()
+        if self.slot is not None:
+            self.game.entities.remove(self)
+        super().kill()
+        if alive and self.pool is not None:
+            self.pool.release(self)
+
+
+class Player(DirtySprite):
+    parallax = 1
+
     def __init__(self, game):
         self._layer = PLAYER_LAYER
         self.groups = game.all_sprites
         super().__init__(self.groups)
+        # Always redrawn by the dirty rect renderer
+        self.dirty = 2
         self.game = game
         self.walking = False
         self.jumping = False
@@ -31,6 +118,7 @@ class Player(Sprite):
         self.last_update = 0
         self.load_images()
         self.image = self.standing_frames[0]
+        self.mask = self.game.spritesheet.get_mask(self.image)
         self.rect = self.image.get_rect()
         self.rect.center = (40, HEIGHT - 100)
         self.pos = vec(40, HEIGHT - 100)
@@ -40,50 +128,45 @@ class Player(Sprite):
         self.shield_rect.center = (40, HEIGHT - 100)
 
         self.is_shield = False
-        self.shield_time = pg.time.get_ticks()
+        self.shield_time = self.game.clock.get_ticks()
         self.jump_boost = False
         self.boost_sound = False
-        self.jump_boost_time = pg.time.get_ticks()
+        self.jump_boost_time = self.game.clock.get_ticks()
 
 
 
     def load_images(self):
-        self.standing_frames = [self.game.spritesheet.get_image(614, 1063, 120, 191),
-            self.game.spritesheet.get_image(690, 406, 120, 201)]
-        for frame in self.standing_frames:
-            frame.set_colorkey('black')
+        sheet = self.game.spritesheet
+        self.standing_frames = [sheet.get_frame(name) for name in PLAYER_STAND_FRAMES]
+        self.walk_frames_r = [sheet.get_frame(name) for name in PLAYER_WALK_FRAMES]
+        self.walk_frames_l = [sheet.get_frame(name, flip=True) for name in PLAYER_WALK_FRAMES]
+        self.jump_frame = sheet.get_frame(PLAYER_JUMP_FRAME)
+        self.shield_icon = sheet.get_frame(SHIELD_FRAME)
 
-        self.walk_frames_r = [self.game.spritesheet.get_image(678, 860, 120, 201),
-            self.game.spritesheet.get_image(692, 1458, 120, 207)]
-        for frame in self.walk_frames_r:
-            frame.set_colorkey('black')
 
-        self.walk_frames_l = []
-        for frame in self.walk_frames_r:
-            self.walk_frames_l.append(pg.transform.flip(frame, True, False))
-
-        self.jump_frame = self.game.spritesheet.get_image(382, 763, 150, 181)
-        self.jump_frame.set_colorkey('black')
-
-        self.shield_icon = self.game.spritesheet.get_image(0, 1662, 211, 215)
-        self.shield_icon.set_colorkey('black')
-
-
-    def jump(self):
+    def jump(self, fraction=0.0):
         # Jump only if standing on platforms.
         self.rect.y += 2
-        hits = pg.sprite.spritecollide(self, self.game.platforms, False)
+        hits = self.game.platforms.spritecollide(self)
         self.rect.y -= 2
         if (hits and not self.jumping) or self.jump_boost:
-            self.game.jump_sound.play()
+            self.game.sounds.play('jump')
             self.jumping = True
-            self.vel.y = -PLAYER_JUMP
+            self.set_vel_y(-PLAYER_JUMP, fraction)
 
 
-    def jump_cut(self):
+    def jump_cut(self, fraction=0.0):
         if self.jumping:
             if self.vel.y < -5:
-                self.vel.y = -5
+                self.set_vel_y(-5, fraction)
+
+
+    def set_vel_y(self, vel, fraction):
+        # Change the vertical speed fraction of the way into the coming
+        # tick: the old speed still moves the player until then. 0 is the
+        # start of the tick, 1 ends up exactly like doing it next tick.
+        self.pos.y += (self.vel.y - vel) * fraction + GRAVITY * fraction * fraction
+        self.vel.y = vel - GRAVITY * fraction
 
 
     def update(self):
@@ -95,7 +178,7 @@ class Player(Sprite):
         self.animate()
 
         self.acc = vec(0, GRAVITY)
-        keys = pg.key.get_pressed()
+        keys = self.game.input.get_pressed()
         if keys[pg.K_LEFT]:
             self.acc.x = -PLAYER_ACC
         if keys[pg.K_RIGHT]:
@@ -119,7 +202,7 @@ class Player(Sprite):
 
 
     def animate(self):
-        now = pg.time.get_ticks()
+        now = self.game.clock.get_ticks()
         if self.vel.x != 0:
             self.walking = True
         else:
@@ -152,59 +235,60 @@ class Player(Sprite):
                 self.rect = self.image.get_rect()
                 self.rect.bottom = bottom
         # Mask for pixel perfect collision
-        self.mask = pg.mask.from_surface(self.image)
+        self.mask = self.game.spritesheet.get_mask(self.image)
 
 
     def shield(self):
-        if pg.time.get_ticks() - self.shield_time  > SHIELD_TIME and self.is_shield:
+        if self.game.clock.get_ticks() - self.shield_time  > SHIELD_TIME and self.is_shield:
             self.is_shield = False
-            self.game.s_down_sound.play()
+            self.game.sounds.play('shield_down')
         self.shield_rect.center = self.rect.center
 
 
     def bunny(self):
         if self.jump_boost:
-            if pg.time.get_ticks() - self.jump_boost_time  > BUNNY_TIME - BUNNY_TIME / 3 and self.boost_sound:
-               self.game.alarm.play(loops=3)
+            if self.game.clock.get_ticks() - self.jump_boost_time  > BUNNY_TIME - BUNNY_TIME / 3 and self.boost_sound:
+               self.game.sounds.play('alarm', loops=3)
                self.boost_sound = False
-            if pg.time.get_ticks() - self.jump_boost_time  > BUNNY_TIME:
+            if self.game.clock.get_ticks() - self.jump_boost_time  > BUNNY_TIME:
                 self.jump_boost = False
 
 
 
 
-class Platform(Sprite):
-    def __init__(self, game, x, y):
-        self._layer = PLATFORM_LAYER
-        self.groups = game.all_sprites, game.platforms
-        super().__init__(self.groups)
-        self.game = game
-        images = [self.game.spritesheet.get_image(0, 288, 380, 94),
-            self.game.spritesheet.get_image(213, 1662, 201, 100)
-        ]
-        self.image = choice(images)
-        self.image.set_colorkey('black')
+class Platform(WorldSprite):
+    _layer = PLATFORM_LAYER
+
+    def reset(self, x, y, frame=None):
+        self.groups = self.game.all_sprites, self.game.platforms
+        self.add(self.groups)
+        if frame is None:
+            frame = choice(PLATFORM_FRAMES)
+        self.image = self.game.spritesheet.get_frame(frame)
         self.rect  = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
+        self.pow = None
         if randrange(100) < POW_SPAWN_PCT:
-            Pow(self.game, self)
-
-class Pow(Sprite):
-    def __init__(self, game, plat):
-        self._layer = POW_LAYER
-        self.groups = game.all_sprites, game.powerups
-        super().__init__(self.groups)
-        self.game = game
+            self.pow = self.game.pools['pow'].spawn(self)
+
+    def kill(self):
+        # A recycled platform must not carry its old powerup along
+        if self.pow is not None:
+            self.pow.kill()
+        super().kill()
+
+class Pow(WorldSprite):
+    _layer = POW_LAYER
+
+    def reset(self, plat):
+        self.groups = self.game.all_sprites, self.game.powerups
+        self.add(self.groups)
+        # Follows its platform a frame late, so redraw it every frame
+        self.dirty = 2
         self.plat = plat
-        self.type = choice(['boost', 'shield', 'bunny'])
-        if self.type == 'boost':
-            self.image = self.game.spritesheet.get_image(820, 1805, 71, 70)
-        elif self.type == 'shield':
-            self.image = self.game.spritesheet.get_image(894, 1661, 71, 70)
-        elif self.type == 'bunny':
-            self.image = self.game.spritesheet.get_image(826, 1220, 71, 70)
-        self.image.set_colorkey('black')
+        self.type = choice(POW_TYPES)
+        self.image = self.game.spritesheet.get_frame(POW_FRAMES[self.type])
         self.rect  = self.image.get_rect()
         self.rect.centerx = self.plat.rect.centerx
         self.rect.bottom = self.plat.rect.top - 5
@@ -214,28 +298,48 @@ class Pow(Sprite):
         if not self.game.platforms.has(self.plat):
             self.kill()
 
+    def kill(self):
+        if self.plat.pow is self:
+            self.plat.pow = None
+        super().kill()
+
+
+class Mob(WorldSprite):
+    _layer = MOB_LAYER
 
-class Mob(Sprite):
     def __init__(self, game):
-        self._layer = MOB_LAYER
-        self.groups = game.all_sprites, game.mobs
-        super().__init__(self.groups)
-        self.game = game
-        self.image_up = self.game.spritesheet.get_image(566, 510, 122, 139)
-        self.image_up.set_colorkey('black')
-        self.image_down = self.game.spritesheet.get_image(568, 1534, 122, 135)
-        self.image_down.set_colorkey('black')
+        self.image_up = game.spritesheet.get_frame(MOB_UP_FRAME)
+        self.image_down = game.spritesheet.get_frame(MOB_DOWN_FRAME)
+        super().__init__(game)
+
+    def reset(self):
+        self.groups = self.game.all_sprites, self.game.mobs
+        self.add(self.groups)
+        self.dirty = 2
         self.image = self.image_up
+        self.mask = self.game.spritesheet.get_mask(self.image)
         self.rect = self.image.get_rect()
         self.rect.centerx = choice([-100, WIDTH + 100])
         self.vx = randrange(1, 3)
         if self.rect.centerx > WIDTH:
             self.vx *= -1
-        self.rect.y = randrange(HEIGHT / 2)
+        self.rect.y = self.game.camera + randrange(HEIGHT / 2)
         self.vy = 0
         self.dy = 0.5
+        self.track(vx=self.vx, vy=self.vy, dy=self.dy, up=True)
+
+    def face(self, up):
+        # Swap image and mask, used when the entity store moves the mob.
+        # The store keeps the position, rect only takes the new size.
+        self.image = self.image_up if up else self.image_down
+        self.mask = self.game.spritesheet.get_mask(self.image)
+        self.rect.size = self.image.get_size()
+        if self.slot is not None:
+            self.game.entities.set_size(self)
 
     def update(self):
+        if self.slot is not None:
+            return
         self.rect.x += self.vx
         self.vy += self.dy
         if self.vy > 3 or self.vy < -3:
@@ -248,7 +352,7 @@ class Mob(Sprite):
             self.image = self.image_down
         self.rect = self.image.get_rect()
         # Mask for pixel perfect collision
-        self.mask = pg.mask.from_surface(self.image)
+        self.mask = self.game.spritesheet.get_mask(self.image)
         self.rect.center = center
         self.rect.y += self.vy
 
@@ -256,31 +360,34 @@ class Mob(Sprite):
             self.kill()
 
 
-class Cloud(Sprite):
-    def __init__(self, game):
-        self._layer = CLOUD_LAYER
-        self.groups = game.all_sprites, game.clouds
-        super().__init__(self.groups)
-        self.game = game
-        self.image = choice(self.game.cloud_images)
-        self.image.set_colorkey('black')
+class Cloud(WorldSprite):
+    _layer = CLOUD_LAYER
+
+    def reset(self, offset=0):
+        self.groups = self.game.all_sprites, self.game.clouds
+        self.add(self.groups)
+        self.dirty = 2
+        rng = self.game.scenery
+        variants = rng.choice(self.game.cloud_variants)
+        self.image = cloud_variant(variants, rng.randrange(50, 101))
         self.rect = self.image.get_rect()
-        scale = randrange(50, 101) / 100
-        self.image = pg.transform.scale(self.image, (int(self.rect.width * scale),
-            int(self.rect.height * scale)))
-        self.rect.x = randrange(WIDTH - self.rect.width)
-        self.rect.y = randrange(-500, -50)
+        self.rect.x = rng.randrange(WIDTH - self.rect.width)
+        y = rng.randrange(-500, -50) + offset
         self.x = float(self.rect.x)
-        self.vx = uniform(0.5, 1)
-        self.speedy = randrange(2, 4)
+        self.vx = rng.uniform(0.5, 1)
+        self.parallax = rng.randrange(2, 4)
+        self.rect.y = y + self.game.camera // self.parallax
+        self.track(vx=self.vx)
 
 
     def update(self):
+        if self.slot is not None:
+            return
         self.x += self.vx
         self.rect.x = self.x
 
         if self.rect.left > WIDTH:
             self.rect.right = -50
 
-        if self.rect.top > HEIGHT * 2:
+        if self.rect.top - self.game.camera // self.parallax > HEIGHT * 2:
             self.kill()
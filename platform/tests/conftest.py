@@ -0,0 +1,19 @@
+# Tests run headless, from the platform directory or above it.
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def game():
+    from headless import HeadlessGame
+    game = HeadlessGame()
+    yield game
+    game.profiler.close()
+    game.loader.close()
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from bots import Dodger
+from entities import EntityStore
+
+SEED = 1
+MAX_TICKS = 3000
+
+
+def mob_rects(game):
+    # The store owns the positions of what it tracks, rects of sprites off
+    # screen are not kept up to date
+    store = game.entities
+    rects = []
+    for mob in game.mobs:
+        if mob.slot is None:
+            rects.append(tuple(mob.rect))
+        else:
+            i = mob.slot
+            rects.append((store.x[i], store.y[i], store.w[i], store.h[i]))
+    return sorted(rects)
+
+
+def play(game, store):
+    game.use_entity_store = store
+    random.seed(SEED)
+    bot = Dodger()
+    bot.reset(SEED)
+    game.reset()
+    ticks = []
+    while game.playing and game.ticks < MAX_TICKS:
+        bot(game, game.input)
+        game.step()
+        ticks.append(mob_rects(game))
+    return ticks
+
+
+@pytest.mark.skipif(not EntityStore.available, reason='needs NumPy')
+def test_store_moves_mobs_like_their_update(game):
+    try:
+        moved = play(game, True)
+    finally:
+        game.use_entity_store = False
+    assert moved == play(game, False)
@@ -0,0 +1,93 @@
+import random
+
+import pygame as pg
+
+from bots import Dodger
+from replay import Recorder, read_sessions, replay, TICK
+
+
+class FrameClock:
+    """Stands in for the window's frame clock in Game.run.
+
+    Frames come unevenly and never sleep, and a bot plays between them.
+    Its jump key events are given sub-tick fractions like the keyboard
+    input's would be. With taps, the jump key is also often flipped a few
+    times in one frame. The game is stopped after the given frames.
+    """
+    def __init__(self, game, input, frames, seed, taps=False):
+        self.game = game
+        self.input = input
+        self.frames = frames
+        self.taps = taps
+        self.rng = random.Random(seed)
+        self.bot = Dodger()
+        self.bot.reset(seed)
+
+    def tick(self, fps=None, idle=None):
+        self.frames -= 1
+        if self.frames < 0:
+            self.game.playing = False
+            return 0
+        self.bot(self.game, self.input)
+        if self.taps and self.rng.randrange(8) == 0:
+            for i in range(self.rng.randrange(2, 5)):
+                if pg.K_UP in self.input.held:
+                    self.input.release(pg.K_UP)
+                else:
+                    self.input.press(pg.K_UP)
+        for event in self.input.events:
+            event.fraction = self.rng.randrange(256) / 255
+        return self.rng.choice((8, 16, 17, 17, 33))
+
+
+def record(game, path, seeds, frames=1500, taps=False):
+    recorder = Recorder(path)
+    input, frame_clock = game.input, game.frame_clock
+    try:
+        for seed in seeds:
+            game.frame_clock = FrameClock(game, input, frames, seed, taps)
+            recorder.start(game, seed)
+            game.reset()
+            game.run()
+            recorder.stop()
+    finally:
+        game.frame_clock = frame_clock
+        recorder.close()
+
+
+def test_window_session_replays(game, tmp_path):
+    path = tmp_path / 'replay.bin'
+    record(game, path, (1, 2, 3))
+    sessions = read_sessions(path)
+    assert len(sessions) == 3
+    assert any(session.fractions for session in sessions)
+    for session in sessions:
+        result = replay(game, session)
+        assert result['matches'], result
+
+
+def test_quick_taps_replay(game, tmp_path):
+    path = tmp_path / 'replay.bin'
+    record(game, path, (5, 6, 7), taps=True)
+    sessions = read_sessions(path)
+    # Some ticks had more jump events than the input bits hold
+    assert any(len(jumps) > 2 for session in sessions for jumps in session.jumps.values())
+    for session in sessions:
+        result = replay(game, session)
+        assert result['matches'], result
+
+
+def test_torn_log_keeps_whole_ticks(game, tmp_path):
+    path = tmp_path / 'replay.bin'
+    record(game, path, (4,), frames=300)
+    data = path.read_bytes()
+    whole = read_sessions(path)[0]
+    path.write_bytes(data[:-1])
+    torn = read_sessions(path)[0]
+    assert torn.ticks is None
+    assert torn.inputs == whole.inputs
+    # Cut inside the last tick record as well
+    path.write_bytes(data[:-len(data) + len(data) // 2] + bytes(TICK.size - 1))
+    torn = read_sessions(path)[0]
+    assert whole.inputs.startswith(torn.inputs)
+    assert replay(game, torn)['matches']
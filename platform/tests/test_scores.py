@@ -0,0 +1,45 @@
+from scores import ScoreBoard, RECORD_SIZE
+
+
+def fill(path, scores):
+    board = ScoreBoard(str(path))
+    for i, score in enumerate(scores):
+        board.add(score, 1000 * i, seed=i, stamp=float(i))
+    board.close()
+
+
+def test_log_round_trip(tmp_path):
+    path = tmp_path / 'scores.log'
+    fill(path, (30, 10, 50, 30))
+    board = ScoreBoard(str(path))
+    assert board.top() == [(50, 2000, 2, 2.0), (30, 0, 0, 0.0),
+                           (30, 3000, 3, 3.0), (10, 1000, 1, 1.0)]
+    assert board.best() == 50
+    assert board.percentile(30) == 25.0
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = tmp_path / 'scores.log'
+    fill(path, (30, 10, 50))
+    # A crash halfway through writing a fourth record
+    with open(path, 'ab') as f:
+        f.write(b'\x07' * (RECORD_SIZE // 2))
+    board = ScoreBoard(str(path))
+    assert len(board) == 3
+    assert path.stat().st_size == 3 * RECORD_SIZE
+    # New records line up after the good ones again
+    board.add(70, 0, seed=9, stamp=9.0)
+    board.close()
+    board = ScoreBoard(str(path))
+    assert [record[0] for record in board.top()] == [70, 50, 30, 10]
+
+
+def test_corrupt_record_ends_the_log(tmp_path):
+    path = tmp_path / 'scores.log'
+    fill(path, (30, 10, 50))
+    data = bytearray(path.read_bytes())
+    data[RECORD_SIZE + 1] ^= 0xFF
+    path.write_bytes(data)
+    board = ScoreBoard(str(path))
+    assert [record[0] for record in board.top()] == [30]
+    assert path.stat().st_size == RECORD_SIZE
@@ -0,0 +1,80 @@
+import copy
+import random
+
+import pygame as pg
+
+from bots import Dodger, Mash
+from headless import play
+from snapshot import snapshot, restore, fork
+
+SEED = 7
+MAX_TICKS = 4000
+
+
+def start(game, seed=SEED, bot=None):
+    random.seed(seed)
+    bot = bot or Dodger()
+    bot.reset(seed)
+    game.reset()
+    return bot
+
+
+def finish(game, bot):
+    while game.playing and game.ticks < MAX_TICKS:
+        bot(game, game.input)
+        game.step()
+    return game.score, game.ticks, tuple(game.player.pos)
+
+
+def test_restore_replays_exactly(game):
+    bot = start(game)
+    for tick in range(300):
+        bot(game, game.input)
+        game.step()
+    state = snapshot(game)
+    first = finish(game, bot)
+    restore(game, state)
+    assert snapshot(game) == state
+    bot.reset(SEED)
+    assert finish(game, bot) == first
+
+
+def test_fork_leaves_the_game_alone(game):
+    expected = finish(game, start(game))
+
+    bot = start(game)
+    for tick in range(300):
+        bot(game, game.input)
+        game.step()
+    branch = fork(game)
+    state = snapshot(branch)
+    for key in (pg.K_LEFT, pg.K_RIGHT):
+        restore(branch, state)
+        branch.input.set_keys((key, pg.K_UP))
+        for tick in range(60):
+            branch.step()
+    assert finish(game, bot) == expected
+
+
+def test_forks_play_like_the_game(game):
+    # Mash keeps no references to sprites, so it copies over to the fork
+    bot = start(game, bot=Mash())
+    for tick in range(300):
+        bot(game, game.input)
+        game.step()
+    branch = fork(game)
+    assert finish(branch, copy.deepcopy(bot)) == finish(game, bot)
+
+
+def test_forks_keep_their_own_run(game):
+    start(game, bot=Mash())
+    branch = fork(game)
+    assert branch.input_stamps is not game.input_stamps
+    assert branch.frame_clock is not game.frame_clock
+    outer = random.getstate()
+    # A seeded game plays the same on a fork, without moving the game's stream
+    assert play(branch, Mash(), seed=3, max_ticks=MAX_TICKS) == \
+        play(game, Mash(), seed=3, max_ticks=MAX_TICKS)
+    random.setstate(outer)
+    play(branch, Mash(), seed=4, max_ticks=600)
+    assert random.getstate() == outer
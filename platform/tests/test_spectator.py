@@ -0,0 +1,63 @@
+import socket
+import time
+
+import pytest
+
+from settings import *
+from spectator import (SpectatorServer, WorldState, Spectator, encode, MAGIC, LENGTH,
+                       GHOST, GHOST_MESSAGE, MAX_MESSAGE, PLAYER_FRAME_IDS, GHOST_TOP,
+                       KEY_FRAME, DELTA_FRAME, PLATFORM, MOB)
+
+
+def test_frames_round_trip():
+    first = WorldState(10, (100, -300, 40, 500, 2, 1),
+                       {1: (PLATFORM, 0, 540, 5), 2: (PLATFORM, 200, 300, 6),
+                        3: (MOB, -100, 120, 15)})
+    second = WorldState(11, (110, -310, 44, 490, 4, 0),
+                        {1: (PLATFORM, 0, 540, 5), 3: (MOB, -97, 121, 16),
+                         4: (PLATFORM, 150, 180, 5)})
+    spectator = Spectator()
+    assert spectator.apply(encode(first)) == KEY_FRAME
+    assert spectator.entities == first.entities
+    delta = encode(second, first)
+    # Only what changed goes out
+    assert len(delta) < len(encode(second))
+    assert spectator.apply(delta) == DELTA_FRAME
+    assert (spectator.tick, spectator.score, spectator.camera) == (11, 110, -310)
+    assert spectator.player == (44, 490, 4, 0)
+    assert spectator.entities == second.entities
+    # A delta from a tick the client never saw can't be applied
+    with pytest.raises(ValueError):
+        spectator.apply(encode(second, WorldState(5, first.header, {})))
+
+
+def send_ghost(sock, server, x, y, frame):
+    message = GHOST.pack(GHOST_MESSAGE, x, y, frame)
+    ghosts = server.ghosts
+    sock.sendall(LENGTH.pack(len(message)) + message)
+    # Wait for the server thread to take it, or give up on it
+    deadline = time.monotonic() + 1
+    while server.ghosts is ghosts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.ghosts
+
+
+def test_ghosts_are_checked():
+    server = SpectatorServer('127.0.0.1', 0).start()
+    try:
+        with socket.create_connection((server.host, server.port)) as sock:
+            sock.sendall(MAGIC)
+            assert send_ghost(sock, server, 10, 10, 200) == ()
+            frame = min(PLAYER_FRAME_IDS)
+            assert send_ghost(sock, server, 30000, 2 ** 31 - 1, frame) == ((WIDTH, HEIGHT, frame),)
+            assert send_ghost(sock, server, -5, -2 ** 31, frame) == ((0, GHOST_TOP, frame),)
+            # Empty messages are skipped and the connection stays up
+            sock.sendall(LENGTH.pack(0))
+            assert send_ghost(sock, server, 5, 5, frame) == ((5, 5, frame),)
+            # A length no client would send gets it hung up on
+            sock.sendall(LENGTH.pack(MAX_MESSAGE + 1))
+            sock.settimeout(1)
+            assert sock.recv(1) == b''
+            assert server.ghosts == ()
+    finally:
+        server.close()